@@ -0,0 +1,182 @@
+'''
+Benchmarks of the simulation and fitting hot paths, which run headless with fixed seeds and save their timings as JSON,
+so a code change or a new numpy / scipy release can be compared to an earlier run:
+
+python Benchmark.py --out bench_new.json --compare bench_old.json
+
+Every case is run --repeat times (after one untimed warm-up run) and the min, median and mean wall time are stored.
+--quick only runs the small cases, --filter only runs the cases whose name contains the given text.
+--check doesn't time anything, but compares the M(H) loops of the built-in Newton solver with the ones of scipy's newton-cg.
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import scipy
+
+from MacrospinModel import MacrospinModel
+from FigureOfMerit import FigureOfMerit
+from EnergyLandscape import EnergyLandscape
+from WadgeDiscreteEnergyModel import WadgeDiscreteEnergyModel
+import DataIO
+
+
+SEED = 12345
+# symmetric and asymmetric SAF (SI units like MacrospinModel), the field angles phiH are added per case
+SAF_PARAMS = {"sym": [6.25e-3, 1e-3, np.pi/2, -0.75e-3, -0.25e-3, 6.25e-3, 1e-3, np.pi/2],
+              "asym": [8e-3, 2e-3, 0, -0.6e-3, -0.1e-3, 5e-3, 0.5e-3, np.pi/3]}
+PHIHS = {1: [0], 3: [0, np.pi/4, np.pi/2]}
+
+
+def timeit(func, repeat):
+    # one warm-up run, then repeat timed runs in s
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": float(np.median(times)), "mean": float(np.mean(times)), "repeat": repeat}
+
+
+def getParams(saf, n_phiH):
+    return list(SAF_PARAMS[saf]) + [list(PHIHS[n_phiH])]
+
+
+def getExpData(param_values, sim_H):
+    # synthetic exp. data from one simulation with slightly perturbed parameters (fixed seed), so fit_cost has something to score
+    rng = np.random.default_rng(SEED)
+    true_values = [p * (1 + 0.05 * rng.standard_normal()) if i in (1, 3, 4) else p for i, p in enumerate(param_values)]
+    M = MacrospinModel(None, sim_H, true_values).calculateMH()[0]
+    exp_H = list(sim_H) + list(sim_H[::-1][1:])
+    exp_M = [list(np.asarray(M_j[:len(exp_H)]) * (1 + 1e-3 * rng.standard_normal(len(exp_H)))) for M_j in M]
+    return exp_M, exp_H, DataIO.getStepWeights(exp_H)
+
+
+def getCases(quick):
+    # {name: (function to time, description of the case)}
+    cases = {}
+    dHs = [10e-3, 2.5e-3] if quick else [10e-3, 2.5e-3, 1e-3]
+    for dH in dHs:
+        sim_H = DataIO.buildSimH([], 1.0, dH)[0]
+        for n_phiH in (1, 3):
+            for saf in ("sym", "asym"):
+                name = "calculateMH/n_H={n}/phiH={p}/{s}".format(n=len(sim_H), p=n_phiH, s=saf)
+                cases[name] = (lambda sim_H=sim_H, params=getParams(saf, n_phiH): MacrospinModel(None, sim_H, list(params)).calculateMH(),
+                               {"n_H": len(sim_H), "n_phiH": n_phiH, "saf": saf})
+        name = "calculateMH/n_H={n}/phiH=3/asym/adaptive".format(n=len(sim_H))
+        cases[name] = (lambda sim_H=sim_H: MacrospinModel(None, sim_H, getParams("asym", 3), adaptive_step="on").calculateMH(),
+                       {"n_H": len(sim_H), "n_phiH": 3, "saf": "asym", "adaptive_step": "on"})
+
+    # fit_cost and FOM on exp. data with the field steps of an exp. loop
+    sim_H = DataIO.buildSimH([], 1.0, 5e-3)[0]
+    param_values = getParams("asym", 3)
+    exp_M, exp_H, exp_H_steps = getExpData(param_values, sim_H)
+    fom = FigureOfMerit(exp_M, exp_H, exp_H_steps, H1=0.05, H2=0.6, fit_focus="C")
+    fit_para_ind = [3, 4]
+    paras = np.random.default_rng(SEED).uniform([-0.8e-3, -0.2e-3], [-0.5e-3, -0.05e-3], size=(4, 2))
+    def fitCost(warm_start=False):
+        fit_values = list(param_values)
+        for i in fit_para_ind: fit_values[i] = None
+        model = MacrospinModel(None, DataIO.buildSimH(exp_H, 1.0, 5e-3)[0], fit_values, exp_H=exp_H, fit_paras=list(paras[0]), fit_para_ind=fit_para_ind,
+                               bnds=[[-1.5e-3, 0], [-0.5e-3, 0]], fit_type="fast fit", fom=fom, warm_start=warm_start)
+        model.fitting = True
+        model.fit_iteration, model.cur_fit_type = 1, "Global"
+        for p in paras: model.fit_cost(p)
+    cases["fit_cost/phiH=3/asym/4_evaluations"] = (fitCost, {"n_H": len(exp_H), "n_phiH": 3, "evaluations": len(paras)})
+    cases["fit_cost/phiH=3/asym/4_evaluations/warm_start"] = (lambda: fitCost(warm_start=True), {"n_H": len(exp_H), "n_phiH": 3, "evaluations": len(paras), "warm_start": True})
+    sim_M = [np.asarray(M) * 1.01 for M in exp_M]
+    cases["FOM/phiH=3/1000_evaluations"] = (lambda: [fom(sim_M) for _ in range(1000)], {"n_H": len(exp_H), "n_phiH": 3, "evaluations": 1000})
+
+    # energy landscape stack of a whole sweep
+    for n_phi in ((120,) if quick else (120, 360)):
+        def landscape(n_phi=n_phi):
+            landscape = EnergyLandscape(getParams("asym", 1), sim_H, n_phi=n_phi)
+            landscape.start()
+            landscape.thread.join()
+            landscape.stop()
+        cases["EnergyLandscape/n_H={n}/n_phi={p}".format(n=len(sim_H), p=n_phi)] = (landscape, {"n_H": len(sim_H), "n_phi": n_phi})
+
+    # discrete model at several layer counts on a short field sweep, d (in Angström) sets the number of sublayers per FM
+    wadge_H = list(np.linspace(0.5, -0.5, 11))
+    for d in ((5, 2.5) if quick else (5, 2.5, 1.25)):
+        wadge_params = [2e-9, 1.4, 1.5, 1e-3, np.pi/2, -0.75e-3, -0.25e-3, 2e-9, 1.4, 1.5, 1e-3, np.pi/2, d, 0.05]
+        N = int(2 * 10 / d)
+        cases["Wadge.calculateMH/N={N}+{N}/n_H={n}".format(N=N, n=len(wadge_H))] = (
+            lambda params=wadge_params: WadgeDiscreteEnergyModel(None, wadge_H, list(params)).calculateMH(), {"N_A": N, "N_B": N, "n_H": len(wadge_H)})
+    return cases
+
+
+def getEnvironment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        commit = ""
+    return {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "scipy": scipy.__version__, "platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count(), "seed": SEED}
+
+
+def run(repeat=3, quick=False, filter=None, verbose=True):
+    results = {}
+    for name, (func, info) in getCases(quick).items():
+        if filter is not None and filter not in name: continue
+        results[name] = dict(timeit(func, repeat), **info)
+        if verbose: print("{n:60s} {t:10.4f} s".format(n=name, t=results[name]["min"]), flush=True)
+    return {"environment": getEnvironment(), "results": results}
+
+
+def checkSolvers(tol=1e-3, verbose=True):
+    # the built-in Newton solver has to give the same hysteresis as newton-cg (solver="scipy"), i.e. switch at the same field steps
+    # returns the largest difference of M (in units of the saturation magnetization) of every case and whether all are below tol
+    deviations = {}
+    for dH in (2.5e-3, 1e-3):
+        sim_H = DataIO.buildSimH([], 1.0, dH)[0]
+        for saf in ("asym", "sym"):
+            params = list(SAF_PARAMS[saf]) + [[0, 0.3, 1.0, np.pi/4, np.pi/2]]
+            M_newton = np.array(MacrospinModel(None, sim_H, list(params)).calculateMH()[0])
+            M_scipy = np.array(MacrospinModel(None, sim_H, list(params), solver="scipy").calculateMH()[0])
+            name = "n_H={n}/phiH=5/{s}".format(n=len(sim_H), s=saf)
+            deviations[name] = float(np.max(np.abs(M_newton - M_scipy))) / (params[0] + params[5])
+            if verbose: print("{n:60s} {d:10.2e}".format(n=name, d=deviations[name]), flush=True)
+    return deviations, all(d <= tol for d in deviations.values())
+
+
+def compare(results, baseline):
+    # prints the ratio of the min times (new / old) of all cases in both runs
+    print("\n{n:60s} {o:>10s} {t:>10s} {r:>8s}".format(n="case", o="old [s]", t="new [s]", r="new/old"))
+    for name, result in results["results"].items():
+        if name not in baseline["results"]: continue
+        old = baseline["results"][name]["min"]
+        print("{n:60s} {o:10.4f} {t:10.4f} {r:8.2f}".format(n=name, o=old, t=result["min"], r=result["min"] / old))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the MagSAF simulation and fitting hot paths.")
+    parser.add_argument("--out", default="benchmark.json", help="JSON file for the results (default: benchmark.json)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (default: 3)")
+    parser.add_argument("--quick", action="store_true", help="only the small cases")
+    parser.add_argument("--filter", default=None, help="only cases whose name contains this text")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare with")
+    parser.add_argument("--check", action="store_true", help="only check that the Newton and scipy solvers give the same M(H) loops")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        deviations, passed = checkSolvers()
+        print("Newton and scipy loops " + ("match" if passed else "differ"))
+        return 0 if passed else 1
+
+    results = run(repeat=args.repeat, quick=args.quick, filter=args.filter)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+'''
+Reading and writing of the MagSAF files (exp. M(H) data, parameter files and exported tables) without any GUI access,
+so the GUI and the command line interface (MagSAF_CLI.py) share exactly the same file formats.
+'''
+import gzip
+import itertools
+import json
+import os
+import zipfile
+from collections.abc import Mapping
+import numpy as np
+
+
+# parameter file: 3 tab separated rows (names, units, values) in the units of the GUI
+PARAM_NAMES = ["Ms_A * d_A", "Ms_A", "d_A", "Hani_A", "phiAni_A", "J1", "J2", "Ms_B * d_B", "Ms_B", "d_B", "Hani_B", "phiAni_B", "phiH", "H_afm-c", "H_c-fm", "Ms_tot", "d_tot"]
+PARAM_UNITS = ["[mA]", "[kA/m]", "[nm]", "[mT]", "[deg]", "[mJ/m^2]", "[mJ/m^2]", "[mA]", "[kA/m]", "[nm]", "[mT]", "[deg]", "[deg]", "[mT]", "[mT]", "[kA/m]", "[nm]"]
+# columns of the parameter file which hold the 8 model parameters in param_values
+PARAM_COLUMNS = [0, 3, 4, 5, 6, 7, 10, 11]
+
+
+class UnitError(Exception):
+    # the units of a data file are not supported, the message can be shown to the user as it is
+    pass
+
+
+def getStepWeights(exp_H):
+    # H step density of every data point for the FOM weighting: |H_i-1 - H_i| + |H_i - H_i+1| (twice the one step at both ends)
+    dH = np.abs(np.diff(np.asarray(exp_H, dtype=np.float64)))
+    steps = np.empty(len(dH) + 1)
+    steps[0], steps[-1] = 2 * dH[0], 2 * dH[-1]
+    steps[1:-1] = dH[:-1] + dH[1:]
+    return steps
+
+
+def openText(filename):
+    # text file or gzipped text file (recognized by its first two bytes, not by the file name)
+    with open(filename, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(filename, "rt", encoding="utf-8", errors="replace")
+    return open(filename, "r", encoding="utf-8", errors="replace")
+
+
+def splitHeader(line):
+    # the header rows are tab, comma or whitespace separated
+    delimiter = "\t" if "\t" in line else "," if "," in line else None
+    return [entry.strip() for entry in line.strip("\r\n").split(delimiter)]
+
+
+def getColumnIndex(names, column):
+    # column by index (int or digits) or by its name in the first header row (case insensitive)
+    if isinstance(column, (int, np.integer)) or str(column).isdigit():
+        return int(column)
+    lower_names = [name.lower() for name in names]
+    if str(column).strip().lower() not in lower_names:
+        raise ValueError("there is no column '" + str(column) + "', the columns are: " + ", ".join(names))
+    return lower_names.index(str(column).strip().lower())
+
+
+def loadExpData(filename, d_tot, H_column=0, M_column=1, chunk_rows=100000):
+    # reads one exp. M(H) file (optionally gzipped): two header rows (names, units), then the data columns
+    # H_column and M_column select the columns by index or by name, H in Oe, mT or T and M in kA/m or A/m, d_tot is the total FM thickness in m
+    # the file is read once, the data in chunks of chunk_rows lines, which are parsed straight into float64 arrays
+    # the data is separated by commas (csv) or by tabs / whitespaces
+    # returns exp_H (in T), exp_M (d*M in A) and the H step widths for the FOM weighting as float64 arrays
+    with openText(filename) as f:
+        names = splitHeader(f.readline())
+        units = splitHeader(f.readline())
+        usecols = (getColumnIndex(names, H_column), getColumnIndex(names, M_column))
+        chunks = []
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if len(lines) == 0: break
+            if len(chunks) == 0: delimiter = "," if "," in lines[0] else None
+            chunks.append(np.loadtxt(lines, dtype=np.float64, delimiter=delimiter, usecols=usecols, ndmin=2))
+    data = np.concatenate(chunks) if len(chunks) > 0 else np.empty((0, 2))
+    if len(data) < 2:
+        raise ValueError(str(filename) + " contains less than 2 data rows")
+    exp_H, exp_M = data[:, 0], data[:, 1]
+    exp_H_unit = units[usecols[0]] if usecols[0] < len(units) else ""
+    exp_M_unit = units[usecols[1]] if usecols[1] < len(units) else ""
+
+    # want exp_H in T
+    if "Oe" in exp_H_unit:
+        exp_H = exp_H / 1e4
+    elif "mT" in exp_H_unit:
+        exp_H = exp_H / 1e3
+    elif "T" not in exp_H_unit:
+        raise UnitError("Magnetic field values H of loaded data are neither in units of Oe, mT nor T. Loading data aborted.")
+
+    # want exp_M in A unit (d*M)
+    if "kA/m" in exp_M_unit:
+        exp_M = 1e3 * exp_M * d_tot
+    elif "A/m" in exp_M_unit:
+        exp_M = exp_M * d_tot
+    else:
+        raise UnitError("Magnetization values M of loaded data are neither in units of kA/m nor A/m. Loading data aborted.")
+
+    return exp_H, exp_M, getStepWeights(exp_H)
+
+
+def readParameterFile(filename):
+    # returns the 17 values of a parameter file as strings (see PARAM_NAMES)
+    with open(filename, "r") as f:
+        lines = f.readlines()
+    return [value.replace("\n", "") for value in lines[2].split("\t")]
+
+
+def writeParameterFile(filename, values):
+    # values: the 17 values of PARAM_NAMES in the units of PARAM_UNITS
+    table = np.stack((PARAM_NAMES, PARAM_UNITS, [str(value) for value in values]), dtype=str)
+    np.savetxt(filename, table, fmt='%s', delimiter="\t")
+
+
+def paramValuesFromFile(values):
+    # converts the values of a parameter file into param_values of the model (SI units, the field angles phiH as list)
+    param_values = []
+    for i, col in enumerate(PARAM_COLUMNS):
+        if i in (2, 7):
+            param_values.append(float(values[col]) * (np.pi/180))  # phiani from deg to rad
+        else:
+            param_values.append(float(values[col]) * 1e-3)      # d*Ms from mA to A, Hani from mT to T and J from mJ/m^2 to J/m^2
+    param_values.append([round((np.pi/180) * float(phiH.replace(" ", "")), 4) for phiH in values[12].split(",")])
+    return param_values
+
+
+def parameterFileValues(param_values, Ms_A="unknown", d_A="unknown", Ms_B="unknown", d_B="unknown", H1="", H2="", Ms_tot=0, d_tot=0):
+    # inverse of paramValuesFromFile, Ms_tot in kA/m and d_tot in nm, the other extras are written as they are
+    values = []
+    for i in range(0, 9):
+        if i in (0, 1, 3, 4, 5, 6):
+            values.append(round(param_values[i] * 1e3, 13))
+        elif i in (2, 7):
+            values.append(round(param_values[i] * 180/np.pi, 3))
+        else:
+            values.append(", ".join([str(round(float(phiH)*180/np.pi, 1)) for phiH in param_values[i]]))
+    values.insert(1, Ms_A)
+    values.insert(2, d_A)
+    values.insert(8, Ms_B)
+    values.insert(9, d_B)
+    return [str(value) for value in values + [H1, H2, Ms_tot, d_tot]]
+
+
+def buildSimH(exp_H, max_H, dH, full_hyst="off", use_sim_field="off"):
+    # field values of a simulation (sim_H) and of its plot (sim_H_plot) in T
+    # without exp. data (or with use_sim_field) a sweep from max_H to -max_H with steps of dH is used, otherwise the exp. field values
+    if len(exp_H) == 0 or use_sim_field == "on":
+        sim_H_down_sweep = np.linspace(max_H, -max_H, int(2*max_H/dH))
+        if full_hyst == "off":
+            return list(sim_H_down_sweep), list(np.append(sim_H_down_sweep, sim_H_down_sweep[::-1][1:]))
+        sim_H = list(np.append(sim_H_down_sweep, sim_H_down_sweep[::-1][1:]))
+        return sim_H, list(sim_H)
+    elif full_hyst == "off":
+        i = list(exp_H).index(min(exp_H))
+        return list(exp_H[:i+1]), list(exp_H)
+    return list(exp_H), list(exp_H)
+
+
+def writeTable(filename, names, units, columns, format="txt", chunk_rows=65536):
+    # writes equally long data columns with a name and unit each
+    # "txt" (tab separated) and "csv" have a row of names and a row of units on top, "npz" stores every column under its name
+    # the columns are stacked into one 2D array, which is formatted and written in chunks of chunk_rows rows
+    lengths = [len(column) for column in columns]
+    if len(set(lengths)) > 1:
+        raise ValueError("the columns " + ", ".join(names) + " have different lengths " + ", ".join(str(n) for n in lengths))
+    data = np.column_stack([np.asarray(column, dtype=np.float64) for column in columns])
+    if format == "npz":
+        np.savez(filename, units=np.array(units), **{name: data[:, i] for i, name in enumerate(names)})
+        return
+    delimiter = "," if format == "csv" else "\t"
+    with open(filename, "w", buffering=1 << 20) as f:
+        f.write(delimiter.join(names) + "\n" + delimiter.join(units) + "\n")
+        writeRows(f, data, delimiter, chunk_rows)
+
+
+def writeRows(f, data, delimiter, chunk_rows=65536, fmt="%.15g"):
+    # one % formatting per chunk instead of one per row (same output as np.savetxt), fmt is one format or one per column
+    row_format = delimiter.join([fmt] * data.shape[1] if isinstance(fmt, str) else fmt) + "\n"
+    for i in range(0, len(data), chunk_rows):
+        chunk = data[i:i+chunk_rows]
+        f.write((row_format * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def tableFormat(filename):
+    # format of writeTable from the file extension: .csv, .npz and otherwise tab separated text
+    extension = os.path.splitext(filename)[1].lower()
+    return {".csv": "csv", ".npz": "npz"}.get(extension, "txt")
+
+
+def writeLandscapeStack(filename, sim_H, phi_deg, stack, format="txt"):
+    # energy landscapes G(phiA, phiB) of a whole sweep (stack: n_H x n_phi x n_phi, rows phiA, columns phiB), e.g. EnergyLandscape.getStack()
+    # "npz" stores the stack as one 3D array, the text formats write one row per field and phiA with the energies of all phiB
+    # the text formats are written landscape by landscape, so a memory mapped stack is never loaded as a whole
+    sim_H = np.asarray(sim_H, dtype=np.float64)
+    phi_deg = np.asarray(phi_deg, dtype=np.float64)
+    if format == "npz":
+        np.savez(filename, H=sim_H, phi_top=phi_deg, phi_bot=phi_deg, G=stack)
+        return
+    delimiter = "," if format == "csv" else "\t"
+    names = ["H", "phi_top"] + ["G_(phi_bot=" + str(round(phi, 2)) + "°)" for phi in phi_deg]
+    units = ["[T]", "[deg]"] + ["[normed]"] * len(phi_deg)
+    fmt = ["%.15g", "%.15g"] + ["%.8g"] * len(phi_deg)    # the stack is float32
+    block = np.empty((len(phi_deg), len(phi_deg) + 2))
+    block[:, 1] = phi_deg
+    with open(filename, "w", buffering=1 << 20) as f:
+        f.write(delimiter.join(names) + "\n" + delimiter.join(units) + "\n")
+        for i, H in enumerate(sim_H):
+            block[:, 0] = H
+            block[:, 2:] = stack[i]
+            writeRows(f, block, delimiter, fmt=fmt)
+
+
+# binary project file: an uncompressed npz of plain numeric arrays and one json string with the settings of the GUI
+PROJECT_VERSION = 1
+# arrays smaller than this are read on access, larger ones are memory mapped
+PROJECT_MMAP_BYTES = 1 << 16
+
+
+def saveProject(filename, arrays, settings):
+    # arrays: {name: numeric array}, settings: json serializable dict (e.g. the parameter entries and options of the GUI)
+    # the file is written next to the old one first and then replaced, so an interrupted save never destroys a project
+    arrays = {name: np.ascontiguousarray(value, dtype=np.float64) for name, value in arrays.items()}
+    settings = dict(settings, version=PROJECT_VERSION, arrays=sorted(arrays))
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        np.savez(f, settings=np.array(json.dumps(settings)), **arrays)
+    os.replace(tmp_filename, filename)
+
+
+class ProjectFile(Mapping):
+    '''
+    Read-only view on a project file written by saveProject. Only the zip directory is read when opening the file,
+    every array is loaded on its first access (large ones as read-only np.memmap straight from the file).
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.arrays = {}
+        self.offsets = {}
+        with zipfile.ZipFile(filename) as zf, open(filename, "rb") as f:
+            for info in zf.infolist():
+                if not info.filename.endswith(".npy"): continue
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError(str(filename) + " is a compressed npz file and no MagSAF project")
+                # the .npy data starts behind the local file header (30 bytes + file name + extra field)
+                f.seek(info.header_offset + 26)
+                name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+                self.offsets[info.filename[:-4]] = info.header_offset + 30 + int(name_len) + int(extra_len)
+        if "settings" not in self.offsets:
+            raise ValueError(str(filename) + " is no MagSAF project file")
+        self.settings = json.loads(str(self["settings"][()]))
+        if self.settings.get("version", 0) > PROJECT_VERSION:
+            raise ValueError(str(filename) + " was saved by a newer version of MagSAF")
+
+    def __getitem__(self, name):
+        if name not in self.arrays:
+            self.arrays[name] = self.readArray(name)
+        return self.arrays[name]
+
+    def __iter__(self):
+        return (name for name in self.offsets if name != "settings")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def readArray(self, name):
+        with open(self.filename, "rb") as f:
+            f.seek(self.offsets[name])
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):   shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:                   shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            n_bytes = dtype.itemsize * int(np.prod(shape))
+            if n_bytes < PROJECT_MMAP_BYTES:
+                array = np.frombuffer(f.read(n_bytes), dtype=dtype)
+                return array.reshape(shape, order="F" if fortran_order else "C")
+            return np.memmap(self.filename, dtype=dtype, mode="r", offset=f.tell(), shape=shape, order="F" if fortran_order else "C")
+
+
+def loadProject(filename):
+    # returns the settings dict and the lazily loaded arrays of a project file
+    project = ProjectFile(filename)
+    return project.settings, project
@@ -0,0 +1,81 @@
+import threading
+import tempfile
+import numpy as np
+
+
+class EnergyLandscape():
+    '''
+    Energy landscapes G(phiA, phiB) of the macrospin model for all field values of a sweep, e.g. for the slider view of the GUI.
+    G separates into single layer terms and a coupling term which only depends on phiA - phiB:
+    G(phiA, phiB, H) = gA(phiA, H) + gB(phiB, H) + gAB(phiA - phiB)
+    On a periodic grid, phiA - phiB is a grid point again, so gAB is one field independent (n_phi x n_phi) matrix and each landscape
+    is only the sum of two 1D arrays and this matrix. start() fills the whole stack on a background thread, so get() is just a lookup.
+    param_values: model parameters in SI units (like MacrospinModel), only the first field angle of param_values[8] is used
+    sim_H: field values (in T), n_phi: grid points per angle (120 is a 3° mesh)
+    max_bytes: larger stacks are stored in a memory-mapped temporary file instead of the RAM
+    '''
+    def __init__(self, param_values, sim_H, n_phi=120, max_bytes=256e6):
+        d_Ms_A, hani_A, phiani_A, J1, J2, d_Ms_B, hani_B, phiani_B = param_values[:8]
+        self.phiH = param_values[8][0]
+        self.sim_H = np.array(sim_H, dtype=np.float64)   # a copy, so a memory mapped sim_H of an opened project file can be closed
+        self.n_phi = n_phi
+        self.phi = -np.pi + 2 * np.pi * np.arange(n_phi) / n_phi    # rows are phiA (top), columns are phiB (bot)
+        self.phi_deg = self.phi * 180 / np.pi
+
+        # all energies are multiplied by 10 like in the model. For H < 0 the model flips phiH by 180° and uses |H|, which gives
+        # exactly the same energy as H * cos(phi - phiH), so the signed field is used here
+        h = self.sim_H[:, np.newaxis]
+        self.g_A = - 10 * d_Ms_A * (h * np.cos(self.phi - self.phiH) + 0.5 * hani_A * np.cos(self.phi - phiani_A)**2)
+        self.g_B = - 10 * d_Ms_B * (h * np.cos(self.phi - self.phiH) + 0.5 * hani_B * np.cos(self.phi - phiani_B)**2)
+        cos_AB = np.cos(self.phi - self.phi[0])
+        g_AB = - 10 * (J1 * cos_AB + J2 * cos_AB**2)
+        diff_ind = (np.arange(n_phi)[:, np.newaxis] - np.arange(n_phi)[np.newaxis, :]) % n_phi
+        self.g_AB = g_AB[diff_ind]
+
+        shape = (len(self.sim_H), n_phi, n_phi)
+        if np.prod(shape) * 4 > max_bytes:
+            self.stack_file = tempfile.TemporaryFile()
+            self.stack = np.memmap(self.stack_file, dtype=np.float32, mode="w+", shape=shape)
+        else:
+            self.stack_file = None
+            self.stack = np.empty(shape, dtype=np.float32)
+        self.ready = np.zeros(len(self.sim_H), dtype=bool)
+        self.thread = None
+        self.stop_event = threading.Event()
+
+
+    def start(self, chunk=16):
+        # precomputes all landscapes on a daemon thread, chunk landscapes are broadcast at once
+        if self.thread is not None: return
+        def run():
+            for i in range(0, len(self.sim_H), chunk):
+                if self.stop_event.is_set(): return
+                j = min(i + chunk, len(self.sim_H))
+                self.stack[i:j] = self.g_A[i:j, :, np.newaxis] + self.g_B[i:j, np.newaxis, :] + self.g_AB
+                self.ready[i:j] = True
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None: self.thread.join()
+        if self.stack_file is not None: self.stack_file.close()
+
+
+    def get(self, i):
+        # landscape (n_phi x n_phi) at the field sim_H[i], it is calculated right away if the background thread hasn't reached it yet
+        if not self.ready[i]:
+            self.stack[i] = self.g_A[i, :, np.newaxis] + self.g_B[i, np.newaxis, :] + self.g_AB
+            self.ready[i] = True
+        return self.stack[i]
+
+
+    def getStack(self):
+        # the whole stack (n_H x n_phi x n_phi), landscapes which the background thread hasn't reached yet are calculated right away
+        for i in np.flatnonzero(~self.ready): self.get(i)
+        return self.stack
+
+
+    def isDone(self):
+        return bool(self.ready.all())
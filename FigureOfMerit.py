@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class FigureOfMerit():
+    '''
+    Figure of Merit (FOM) of the Simulations / Fits without any GUI access, so it can also be used inside the
+    worker processes of a parallel fit. It is built once per loaded data and H1/H2 setting: the normalized step weights,
+    region masks and focus multipliers are precomputed into one weight per data point, so scoring is pure NumPy.
+    exp_M: one M(H) list per field angle phiH (in A), all with the same field steps exp_H
+    exp_H, exp_H_steps: exp. field values and their step widths (in T)
+    H1, H2: AFM-C and C-FM transition fields (in T), if one of them is None, no region weighting is used
+    fit_focus: "none", "AFM", "C" or "FM", the FOM of this region is multiplied by 3
+    '''
+    def __init__(self, exp_M, exp_H, exp_H_steps, H1=None, H2=None, fit_focus="none"):
+        self.exp_M = np.asarray(exp_M, dtype=np.float64).reshape(len(exp_M), -1)
+        self.exp_H = np.asarray(exp_H, dtype=np.float64)
+        self.H1, self.H2, self.fit_focus = H1, H2, fit_focus
+        steps = np.asarray(exp_H_steps, dtype=np.float64)
+        step_weights = steps / steps.max()
+        abs_H = np.abs(self.exp_H)
+
+        if H1 is None or H2 is None:
+            self.FM = self.C = self.AFM = None
+            self.weights = step_weights / len(self.exp_H)
+        else:
+            self.FM = H2 <= abs_H                               # Ferromagnetic (FM) region
+            self.C = ~self.FM & (H1 < abs_H) & (abs_H < H2)     # Canted (C) region
+            self.AFM = ~self.FM & ~self.C & (abs_H <= H1)       # Antiferromagnetic (AFM) region
+
+            # if we want to focus on a region, we just put some weight on their FOM
+            region_weights = np.zeros(len(abs_H))
+            for name, mask in (("FM", self.FM), ("C", self.C), ("AFM", self.AFM)):
+                region_weights[mask] = 3 if fit_focus == name else 1
+            self.weights = step_weights * region_weights / (len(self.exp_H) * len(self.exp_M))
+
+
+    def __call__(self, sim_M):
+        # sim_M: (n_angles x n_points) simulated M(H) in A, any additional points after the exp. ones are ignored
+        sim_M = self.checkSimM(sim_M)
+        return np.sum(np.abs(1 - sim_M / self.exp_M) * self.weights)
+
+
+    def gradient(self, sim_M, dsim_M):
+        # dsim_M: (n_angles x n_points x n_paras) derivatives of sim_M with respect to the parameters
+        # returns the FOM and its gradient with respect to these parameters
+        sim_M = self.checkSimM(sim_M)
+        dsim_M = np.asarray(dsim_M, dtype=np.float64)[:, :self.exp_M.shape[1]]
+        ratio = 1 - sim_M / self.exp_M
+        grad = -np.sum((np.sign(ratio) * self.weights / self.exp_M)[..., None] * dsim_M, axis=(0, 1))
+        return np.sum(np.abs(ratio) * self.weights), grad
+
+
+    def checkSimM(self, sim_M):
+        # one simulated M(H) per exp. loop (field angle) with at least as many points, cut to the exp. points
+        sim_M = np.asarray(sim_M, dtype=np.float64)
+        if sim_M.ndim != 2 or len(sim_M) != len(self.exp_M):
+            raise ValueError("the FOM needs one simulated M(H) loop per exp. loop (" + str(len(self.exp_M)) + "), got " + str(len(sim_M)))
+        if sim_M.shape[1] < self.exp_M.shape[1]:
+            raise ValueError("the simulated M(H) loops have less points (" + str(sim_M.shape[1]) + ") than the exp. ones (" + str(self.exp_M.shape[1]) + ")")
+        return sim_M[:, :self.exp_M.shape[1]]
@@ -122,6 +122,7 @@ class Parameter():
         self.param_value = ctk.CTkEntry(parent, font=(font_name, medium_font_size), width=entry_w, validate="key")
         self.param_value.grid(row=row, column=3, padx=pads/2, pady=pads, sticky="w")
         self.param_value.insert(0, start_value)
+        self.exact_value = None
 
         ctk.CTkLabel(parent, text=self.unit, font=(font_name, medium_font_size)).grid(row=row, column=4, padx=(0, 4*pads), pady=pads, sticky="w")
 
@@ -170,7 +171,7 @@ class Parameter():
             self.param_slider.configure(state="disabled")
             self.param_upper.configure(state="disabled")
 
-    def setValue(self, value):
+    def setValue(self, value, exact=False):
         if self.param_value._state == "disabled":
             init_state = "disabled"
             self.param_value.configure(state="normal")
@@ -180,11 +181,16 @@ class Parameter():
         self.param_value.insert(0, str(round(float(value), 4)))
         if init_state == "disabled": self.param_value.configure(state="disabled")
 
+        # for exact values (e.g. fit results) we remember the unrounded value, as long as the entry still shows its rounded version
+        self.exact_value = (self.param_value.get(), np.float64(value)) if exact else None
+
         self.updateSliderRange(value=float(value), init_state=init_state)
 
     def getValue(self):
         if self.param_value.get() == "":
             return None
+        elif self.exact_value is not None and self.exact_value[0] == self.param_value.get():
+            return self.exact_value[1]
         else:
             try:
                 value = round(np.float64(self.param_value.get()), 13)
@@ -208,8 +214,17 @@ class Parameter():
         else:
             return param_lower
 
+    def setBounds(self, lower, upper):
+        for entry, value in ((self.param_lower, lower), (self.param_upper, upper)):
+            entry.delete(0, "end")
+            entry.insert(0, value)
+        self.updateSliderRange()
+
     def getFitCheckbox(self):
         return self.fit_checkbox.get()
+
+    def setFitCheckbox(self, value):
+        self.fit_checkbox.select() if value == "on" else self.fit_checkbox.deselect()
     
     def getLinkCheckbox(self):
         return self.link_checkbox.get()
@@ -1,6 +1,32 @@
 import numpy as np
 import scipy.optimize as o
 import math
+import time
+import multiprocessing
+import copy
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from ModelObserver import ModelObserver
+
+
+# shared progress array and stop flag of the process pool, only set inside its worker processes
+_sweep_progress = None
+_sweep_stop = None
+
+# columns of the solver log (see MacrospinModel.recordStep), one row per solved field step
+SOLVER_LOG_NAMES = ["phiH", "H", "M", "time", "iterations", "evaluations", "hessians", "escapes", "escape_evaluations", "converged"]
+SOLVER_LOG_UNITS = ["[deg]", "[T]", "[A]", "[ms]", "[]", "[]", "[]", "[]", "[]", "[]"]
+
+# rough costs (in s) of spawning the process pool (every worker imports numpy and scipy) and of one field step of each solver
+# outside of fits, the pool is only used if it saves clearly more time than its spawn takes (see usePool)
+POOL_SPAWN_TIME = 1.5
+STEP_TIME = {"newton": 1.5e-4, "scipy": 5e-4}
+
+def _initSweepWorker(progress, stop):
+    global _sweep_progress, _sweep_stop
+    _sweep_progress = progress
+    _sweep_stop = stop
 
 
 def normalizeRadian(phi):      # reduce angles to (-pi < phi < pi)
@@ -15,10 +41,263 @@ def normalizeRadian(phi):      # reduce angles to (-pi < phi < pi)
         return p
 
 
+def normalizeRadianArray(phi):     # normalizeRadian for arrays of angles
+    sign = np.sign(phi)
+    phi_mod = (sign*phi) % (2*np.pi)
+    phi_mod = np.where(phi_mod >= np.pi, phi_mod - (2*np.pi), phi_mod)
+    return sign*phi_mod
+
+
+def energyKernel(param_values, phiA, phiB, h, phiH, order=2):
+    # vectorized energy G, jacobian and hessian of the macrospin model
+    # phiA, phiB, h and phiH can be scalars or arrays and are broadcast against each other, so one call evaluates
+    # a whole stack of (phiA, phiB, h, phiH) points. phiH has to be the field angle at h (already flipped by 180° for h < 0)
+    # returns g with the broadcast shape, dg with shape (..., 2) and d2g with shape (..., 2, 2) (up to the given order)
+    d_Ms_A, hani_A, phiani_A, J1, J2, d_Ms_B, hani_B, phiani_B = param_values[:8]
+    h = np.abs(h)
+
+    # all trig terms are calculated once and shared between energy, jacobian and hessian
+    cos_AH, sin_AH = np.cos(phiA - phiH), np.sin(phiA - phiH)
+    cos_BH, sin_BH = np.cos(phiB - phiH), np.sin(phiB - phiH)
+    cos_Aani, sin_Aani = np.cos(phiA - phiani_A), np.sin(phiA - phiani_A)
+    cos_Bani, sin_Bani = np.cos(phiB - phiani_B), np.sin(phiB - phiani_B)
+    cos_AB, sin_AB = np.cos(phiA - phiB), np.sin(phiA - phiB)
+
+    # energy, jacobian and hessian is multiplied by 10 because it helps the minimizer
+    g_A = - d_Ms_A * (h * cos_AH + 0.5 * hani_A * cos_Aani**2)
+    g_B = - d_Ms_B * (h * cos_BH + 0.5 * hani_B * cos_Bani**2)
+    g_RKKY = - (J1 * cos_AB + J2 * cos_AB**2)
+    g = 10 * (g_A + g_B + g_RKKY)
+    if order == 0:
+        return g
+
+    # double angle terms from the single angle ones
+    sin_2AB = 2 * sin_AB * cos_AB
+    sin_2Aani = 2 * sin_Aani * cos_Aani
+    sin_2Bani = 2 * sin_Bani * cos_Bani
+    dg_RKKY = J1 * sin_AB + J2 * sin_2AB
+    dg = np.empty(np.shape(g) + (2,))
+    dg[..., 0] = 10 * (d_Ms_A * (h * sin_AH + 0.5 * hani_A * sin_2Aani) + dg_RKKY)
+    dg[..., 1] = 10 * (d_Ms_B * (h * sin_BH + 0.5 * hani_B * sin_2Bani) - dg_RKKY)
+    if order == 1:
+        return g, dg
+
+    cos_2AB = 2 * cos_AB**2 - 1
+    cos_2Aani = 2 * cos_Aani**2 - 1
+    cos_2Bani = 2 * cos_Bani**2 - 1
+    d2g_RKKY = J1 * cos_AB + 2 * J2 * cos_2AB
+    d2g = np.empty(np.shape(g) + (2, 2))
+    d2g[..., 0, 0] = 10 * (d_Ms_A * (h * cos_AH + hani_A * cos_2Aani) + d2g_RKKY)     # d2G_dphiA2
+    d2g[..., 1, 1] = 10 * (d_Ms_B * (h * cos_BH + hani_B * cos_2Bani) + d2g_RKKY)     # d2G_dphiB2
+    d2g[..., 0, 1] = - 10 * d2g_RKKY
+    d2g[..., 1, 0] = d2g[..., 0, 1]
+    return g, dg, d2g
+
+
+def energyKernelScalar(param_values, phiA, phiB, h, phiH):
+    # scalar twin of energyKernel for a single (phiA, phiB, h, phiH) point, written with math instead of numpy
+    # because numpy's per-call overhead would dominate the sequential Newton solver below
+    # returns g, (dg_phiA, dg_phiB) and (d2g_phiA2, d2g_phiB2, d2g_phiAphiB), again multiplied by 10
+    d_Ms_A, hani_A, phiani_A, J1, J2, d_Ms_B, hani_B, phiani_B = param_values[:8]
+    h = abs(h)
+    cos_AH, sin_AH = math.cos(phiA - phiH), math.sin(phiA - phiH)
+    cos_BH, sin_BH = math.cos(phiB - phiH), math.sin(phiB - phiH)
+    cos_Aani, sin_Aani = math.cos(phiA - phiani_A), math.sin(phiA - phiani_A)
+    cos_Bani, sin_Bani = math.cos(phiB - phiani_B), math.sin(phiB - phiani_B)
+    cos_AB, sin_AB = math.cos(phiA - phiB), math.sin(phiA - phiB)
+
+    g = -10 * (d_Ms_A * (h * cos_AH + 0.5 * hani_A * cos_Aani**2) + d_Ms_B * (h * cos_BH + 0.5 * hani_B * cos_Bani**2) + J1 * cos_AB + J2 * cos_AB**2)
+    dg_RKKY = J1 * sin_AB + 2 * J2 * sin_AB * cos_AB
+    dg_phiA = 10 * (d_Ms_A * (h * sin_AH + hani_A * sin_Aani * cos_Aani) + dg_RKKY)
+    dg_phiB = 10 * (d_Ms_B * (h * sin_BH + hani_B * sin_Bani * cos_Bani) - dg_RKKY)
+    d2g_RKKY = J1 * cos_AB + 2 * J2 * (2 * cos_AB**2 - 1)
+    d2g_phiA2 = 10 * (d_Ms_A * (h * cos_AH + hani_A * (2 * cos_Aani**2 - 1)) + d2g_RKKY)
+    d2g_phiB2 = 10 * (d_Ms_B * (h * cos_BH + hani_B * (2 * cos_Bani**2 - 1)) + d2g_RKKY)
+    return g, (dg_phiA, dg_phiB), (d2g_phiA2, d2g_phiB2, -10 * d2g_RKKY)
+
+
+def newtonMinimize(param_values, phiA, phiB, h, phiH, maxiter=100, xtol=1e-12, max_step=0.5, min_curvature=0.1):
+    # damped Newton minimizer of G(phiA, phiB) which inverts the 2x2 hessian analytically
+    # it only moves where the hessian is well conditioned, i.e. its smallest eigenvalue is above min_curvature times the largest one
+    # a Newton step from a (nearly) singular hessian can cross the energy barrier, e.g. close to a switching field or a saddle point, where
+    # newton-cg follows another path. So if the hessian at the start or after a step is (nearly) singular, it stops with left_basin set
+    # and the caller minimizes with newton-cg from the starting angles instead, which keeps the hysteresis of the newton-cg solver
+    # steps are limited to max_step (in rad) and halved until the energy decreases (Armijo condition)
+    # convergence is reached like in scipy's newton-cg, i.e. when the sum of the absolute angle updates drops below xtol
+    g, dg, d2g = energyKernelScalar(param_values, phiA, phiB, h, phiH)
+    nfev = 1    # every evaluation gives G, its gradient and its hessian
+    success, left_basin, nit = False, False, 0
+    while nit < maxiter:
+        dg_A, dg_B = dg
+        d2g_AA, d2g_BB, d2g_AB = d2g
+        lam_mean = 0.5 * (d2g_AA + d2g_BB)
+        lam_dif = math.hypot(0.5 * (d2g_AA - d2g_BB), d2g_AB)
+        if not lam_mean - lam_dif > min_curvature * (lam_mean + lam_dif):
+            left_basin = True
+            break
+        det = d2g_AA * d2g_BB - d2g_AB**2
+        nit += 1
+        step_A = -(d2g_BB * dg_A - d2g_AB * dg_B) / det
+        step_B = -(d2g_AA * dg_B - d2g_AB * dg_A) / det
+        step_norm = math.hypot(step_A, step_B)
+        if step_norm > max_step:
+            step_A *= max_step / step_norm
+            step_B *= max_step / step_norm
+
+        # backtracking line search, the small extra tolerance accepts steps whose energy change is below rounding errors
+        slope = dg_A * step_A + dg_B * step_B
+        t = 1
+        while True:
+            g_new, dg_new, d2g_new = energyKernelScalar(param_values, phiA + t*step_A, phiB + t*step_B, h, phiH)
+            nfev += 1
+            if g_new <= g + 1e-4 * t * slope + 1e-14 * abs(g):
+                break
+            t *= 0.5
+            if t < 1e-10:
+                break
+        if t < 1e-10:
+            break   # no downhill step possible anymore
+        phiA += t * step_A
+        phiB += t * step_B
+        g, dg, d2g = g_new, dg_new, d2g_new
+        if abs(t * step_A) + abs(t * step_B) <= xtol:
+            success = True
+            break
+    return o.OptimizeResult(x=np.array([phiA, phiB]), fun=g, jac=np.array(dg), nit=nit, nfev=nfev, success=success, left_basin=left_basin)
+
+
+def newtonMinimizeEnsemble(param_values, phiA, phiB, h, phiH, maxiter=100, xtol=1e-12, max_step=0.5, min_curvature=0.1):
+    # newtonMinimize for K independent members at once: the first 8 param_values, phiA, phiB and phiH can be arrays of length K
+    # all steps are array operations over the members, but every member keeps its own line search and convergence state
+    # members which converged (or can't go downhill anymore) are masked out, i.e. they keep their angles in the following iterations
+    # like in newtonMinimize, members with a (nearly) singular hessian stop with left_basin set and have to be minimized with newton-cg
+    # returns an OptimizeResult with x of shape (K, 2), fun, jac, hess, nit, success and left_basin for every member
+    K = len(phiA)
+    phiA, phiB = np.array(phiA, dtype=np.float64), np.array(phiB, dtype=np.float64)
+    g, dg, d2g = energyKernel(param_values, phiA, phiB, h, phiH)
+    nit = np.zeros(K, dtype=int)
+    success = np.zeros(K, dtype=bool)
+    left_basin = np.zeros(K, dtype=bool)
+    active = np.ones(K, dtype=bool)
+    for it in range(1, maxiter+1):
+        dg_A, dg_B = dg[:, 0], dg[:, 1]
+        d2g_AA, d2g_BB, d2g_AB = d2g[:, 0, 0], d2g[:, 1, 1], d2g[:, 0, 1]
+        lam_mean = 0.5 * (d2g_AA + d2g_BB)
+        lam_dif = np.hypot(0.5 * (d2g_AA - d2g_BB), d2g_AB)
+        left_basin |= active & ~(lam_mean - lam_dif > min_curvature * (lam_mean + lam_dif))
+        det = d2g_AA * d2g_BB - d2g_AB**2
+        active &= ~left_basin
+        if not active.any():
+            break
+        nit[active] = it
+        pending = active.copy()
+        det = np.where(pending, det, 1)
+        step_A = -(d2g_BB * dg_A - d2g_AB * dg_B) / det
+        step_B = -(d2g_AA * dg_B - d2g_AB * dg_A) / det
+        step_norm = np.hypot(step_A, step_B)
+        scale = np.where(step_norm > max_step, max_step / np.where(step_norm > 0, step_norm, 1), 1)
+        step_A, step_B = np.where(pending, step_A * scale, 0), np.where(pending, step_B * scale, 0)
+
+        # backtracking line search of every member, the step length t is only halved for the members which haven't found a downhill step yet
+        slope = dg_A * step_A + dg_B * step_B
+        t = np.ones(K)
+        accepted = np.zeros(K, dtype=bool)
+        g_new, dg_new, d2g_new = g, dg, d2g
+        while pending.any():
+            g_t, dg_t, d2g_t = energyKernel(param_values, phiA + t * step_A, phiB + t * step_B, h, phiH)
+            ok = pending & (g_t <= g + 1e-4 * t * slope + 1e-14 * np.abs(g))
+            g_new = np.where(ok, g_t, g_new)
+            dg_new = np.where(ok[:, None], dg_t, dg_new)
+            d2g_new = np.where(ok[:, None, None], d2g_t, d2g_new)
+            accepted |= ok
+            pending &= ~ok
+            t = np.where(pending, 0.5 * t, t)
+            pending &= t >= 1e-10   # no downhill step possible anymore
+
+        # members without a downhill step stop here, all the others move and check their convergence
+        t_A, t_B = np.where(accepted, t * step_A, 0), np.where(accepted, t * step_B, 0)
+        phiA += t_A
+        phiB += t_B
+        g, dg, d2g = g_new, dg_new, d2g_new
+        converged = accepted & (np.abs(t_A) + np.abs(t_B) <= xtol)
+        success |= converged
+        active = accepted & ~converged
+    return o.OptimizeResult(x=np.stack((phiA, phiB), axis=-1), fun=g, jac=dg, hess=d2g, nit=nit, success=success, left_basin=left_basin)
+
+
+def mirrorSweep(M, sim_H, exp_H=[], full_hyst="off", use_sim_field="off"):
+    # turns the simulated M of one field angle into the M(H) loop to plot and the M(H) for the FOM calculation
+    # depending on full_hyst and use_sim_field, the down sweep is mirrored and / or interpolated onto the exp. field values
+    # (also used by WadgeDiscreteEnergyModel), sim_H: simulated field values, exp_H: exp. field values or [] without exp. data
+    M_FOM = []
+    if len(exp_H) > 0: exp_half_ind = list(exp_H).index(min(exp_H))+1
+    if full_hyst == "off":
+        if use_sim_field == "on" and len(exp_H) > 0:
+            # get separate M which is interpolated to fit exp_H values for FOM calculation
+            M_FOM = np.interp(exp_H[:exp_half_ind][::-1], sim_H[::-1], M[::-1])
+            M_FOM = M_FOM[::-1]
+            H_down_inv = [-h for h in exp_H[:exp_half_ind]]
+            H_up_sweep = list(exp_H[exp_half_ind:])
+            M_FOM_down_inv = [-m for m in M_FOM]
+            M_FOM = np.append(M_FOM, np.interp(H_up_sweep, H_down_inv, M_FOM_down_inv))
+
+            # mirror for M to plot
+            M_up_sweep = [-m for m in M[1:]]
+            M = list(np.append(M, M_up_sweep))
+        elif use_sim_field == "off" and len(exp_H) > 0:
+            H_down_inv = [-h for h in exp_H[:exp_half_ind]]
+            M_down_inv = [-m for m in M]
+            H_up_sweep = list(exp_H[exp_half_ind:])
+            M = np.append(M, np.interp(H_up_sweep, H_down_inv, M_down_inv))
+        elif len(exp_H) == 0:
+            M_up_sweep = [-m for m in M[1:]]
+            M = list(np.append(M, M_up_sweep))
+    elif full_hyst == "on" and use_sim_field == "on" and len(exp_H) > 0:
+        sim_half_ind = sim_H.index(min(sim_H))
+        M_down = np.interp(exp_H[:exp_half_ind][::-1], sim_H[:sim_half_ind][::-1], M[:sim_half_ind][::-1])
+        M_up = np.interp(exp_H[exp_half_ind:], sim_H[sim_half_ind:], M[sim_half_ind:])
+        M_FOM = np.append(M_down[::-1], M_up)
+
+    return M, M_FOM
+
+
+class SimulationCache():
+    # bounded LRU cache of simulated M(H) loops, which can be shared between several models (e.g. a fit and the following simulation)
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, accept=None):
+        # accept(entry) can reject an entry which is there, but lacks something the caller needs (counted as a miss)
+        if key not in self.entries or (accept is not None and not accept(self.entries[key])):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return copy.deepcopy(self.entries[key])     # copies, so the caller can't change the cached loop
+
+    def put(self, key, value):
+        self.entries[key] = copy.deepcopy(value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
 class MacrospinModel():
-    def __init__(self, gui, sim_H, param_values, exp_H=[], fit_paras=None, fit_para_ind=[], fit_type=None, bnds=None, full_hyst="off", use_sim_field="off"):
-        self.gui = gui
-        if self.gui is not None: self.gui.prog_bar.set(0)
+    def __init__(self, observer, sim_H, param_values, exp_H=[], fit_paras=None, fit_para_ind=[], fit_type=None, bnds=None, full_hyst="off", use_sim_field="off",
+                 solver="newton", newton_maxiter=100, newton_xtol=1e-12, workers=1, fom=None, cache=None, analytic_gradient=True,
+                 adaptive_step="off", adaptive_tol=1e-3, adaptive_max_stride=16, ensemble=False, instrument=False,
+                 warm_start=False, warm_start_size=16, warm_start_tol=1e-6):
+        # the model runs headless and reports progress, stop requests and fit results only through its observer
+        self.observer = observer if observer is not None else ModelObserver()
+        self.observer.setProgress(0)
         self.sim_H = list(sim_H)
         self.phiHs = param_values[8]
         self.phiH = self.phiHs[0]
@@ -36,6 +315,30 @@ class MacrospinModel():
         self.best_FOM = 100000
         self.linkedParas = False
         self.use_sim_field = use_sim_field
+        self.solver = solver    # "newton" for the built-in 2x2 Newton solver or "scipy" for scipy's newton-cg
+        self.newton_maxiter = newton_maxiter
+        self.newton_xtol = newton_xtol
+        self.workers = workers  # number of processes to spread the phiH sweeps and fit candidates over
+        self.fom = fom    # FigureOfMerit object with the exp. data to score the simulations of a fit
+        self.cache = cache  # SimulationCache which returns already simulated loops without solving them again
+        self.analytic_gradient = analytic_gradient  # polish the fit with analytic FOM gradients instead of finite differences
+        self.compute_gradient = False   # is only switched on while the polish needs the sensitivities dM/dparameter
+        self.dM_FOM = None
+        self.adaptive_step = adaptive_step  # "on" skips field steps where the angles change smoothly (see sweepAnglesAdaptive)
+        self.adaptive_tol = adaptive_tol    # max. deviation (in rad) of the solved angles from the predicted ones to accept a stride
+        self.adaptive_max_stride = adaptive_max_stride
+        self.ensemble = ensemble    # simulate the whole population of a differential evolution generation at once (see calculateMHEnsemble)
+        self.escape_stats = {"escapes": 0, "evaluations": 0, "iterations": 0}  # saddle escapes of all sweeps of this model and what they cost
+        self.instrument = instrument    # record every field step of calculateMH in solver_log, when it is off nothing is measured at all
+        self.solver_log = None
+        self.step_evaluations, self.step_hessians = 0, 0
+        self.warm_start = warm_start    # start each field step from the angles of the nearest previously simulated parameters (see solveWarm)
+        self.warm_start_size = warm_start_size  # number of stored trajectories
+        self.warm_start_tol = warm_start_tol    # max. difference (in rad) between the warm started and the sequential step to keep the warm started one
+        self.trajectories = []  # (scaled parameters, field grid, phiA, phiB) of the last simulations, the newest last
+        self.warm_guess = None
+        self.warm_stats = {"warm_steps": 0, "fallbacks": 0}
+        self.pool = None
 
         # if d * Ms as well as Hani and phiani of both FM are identical, the simulation is buggy
         # to circumvent this, we check on class creation if this is the case and adjust one anisotropy angle by 0.01°
@@ -71,67 +374,132 @@ class MacrospinModel():
             popsize = 10
 
         try:
-            global_fitted_paras = o.differential_evolution(self.fit_cost, bounds=self.bnds, x0=self.fit_paras, maxiter=maxiter, popsize=popsize, polish=False)
-            self.gui.writeConsole("Global Fit success: " + str(global_fitted_paras.success))
-            self.gui.writeConsole("Global Fit message: " + str(global_fitted_paras.message))
+            if self.fom is None: raise ValueError("the model needs a FigureOfMerit with the exp. data to fit")
+            if self.ensemble and not self.ensembleSupported():
+                self.observer.writeConsole("Simulate Fit Generations at once only supports the plain sweep of the built-in newton solver, the generations are simulated one by one.")
+            if self.ensemble and self.ensembleSupported():
+                # the whole population of each generation is swept through the fields together by calculateMHEnsemble
+                global_fitted_paras = o.differential_evolution(self.fit_cost_ensemble, bounds=self.bnds, x0=self.fit_paras, maxiter=maxiter, popsize=popsize, polish=False,
+                                                               vectorized=True, updating="deferred")
+            elif self.workers > 1:
+                # each generation is evaluated in the process pool by evaluateFOM, 
+                # the observer is only updated by globalFitCallback from this process after each generation
+                self.fit_stopped = False
+                global_fitted_paras = o.differential_evolution(self.evaluateFOM, bounds=self.bnds, x0=self.fit_paras, maxiter=maxiter, popsize=popsize, polish=False,
+                                                               workers=self.poolMap, updating="deferred", callback=self.globalFitCallback)
+                if self.fit_stopped: raise Exception
+            else:
+                global_fitted_paras = o.differential_evolution(self.fit_cost, bounds=self.bnds, x0=self.fit_paras, maxiter=maxiter, popsize=popsize, polish=False)
+            self.observer.writeConsole("Global Fit success: " + str(global_fitted_paras.success))
+            self.observer.writeConsole("Global Fit message: " + str(global_fitted_paras.message))
             self.cur_fit_type = "Polish"
-            polished_fit_paras = o.minimize(self.fit_cost, global_fitted_paras.x, method='L-BFGS-B', bounds=self.bnds, options={"ftol": 1e-4})
-            self.gui.writeConsole("Polish Fit success: " + str(polished_fit_paras.success))
-            self.gui.writeConsole("Polish Fit message: " + str(polished_fit_paras.message))
+            if self.analytic_gradient:
+                polished_fit_paras = o.minimize(self.fit_cost_grad, global_fitted_paras.x, method='L-BFGS-B', jac=True, bounds=self.bnds, options={"ftol": 1e-4})
+            else:
+                polished_fit_paras = o.minimize(self.fit_cost, global_fitted_paras.x, method='L-BFGS-B', bounds=self.bnds, options={"ftol": 1e-4})
+            self.observer.writeConsole("Polish Fit success: " + str(polished_fit_paras.success))
+            self.observer.writeConsole("Polish Fit message: " + str(polished_fit_paras.message))
             return list(polished_fit_paras.x)
         except Exception as err:
             if len(err.args) == 0:
-                self.gui.writeConsole("Fit aborted.")
+                self.observer.writeConsole("Fit aborted.")
             else:
-                self.gui.writeConsole("Fit Error: " + str(err))
+                self.observer.writeConsole("Fit Error: " + str(err))
             return []
+        finally:
+            self.shutdownPool()
         
 
     def fit_cost(self, paras, *args):
-        if self.use_sim_field == "on":
-            M_tot_plot, M_tot_FOM, phiA, phiB = self.calculateMH(self.sim_H, paras)
-        else:
-            M_tot_plot, phiA, phiB = self.calculateMH(self.sim_H, paras)
-            M_tot_FOM = M_tot_plot
-        if len(M_tot_plot) == 0: raise Exception # if we pressed the stop button, we raise an Exception to stop fitting
+        result = self.simulateFOM(paras)
+        if result is None: raise Exception # if we pressed the stop button, we raise an Exception to stop fitting
 
-        FOM = self.gui.getFOM(sim_M=M_tot_FOM)
+        FOM, M_tot_plot = result
         if FOM < self.best_FOM:
             self.best_FOM = FOM
-            self.gui.sim_M = M_tot_plot
-            self.gui.sim_M_plot = []
-            for i in range(len(M_tot_plot)):
-                self.gui.sim_M_plot.append([m * 1e3 for m in M_tot_plot[i]])
-            self.gui.drawPlot("Hysteresis", rescale=False)
-
-            fitted_paras = list(paras).copy()
-            self.gui.writeConsole("------------------------------------------------")
-            for i in self.fit_para_ind:
-                if i in (2, 7):
-                    fitted_paras[0] *= (180/np.pi) # phiani from pi values to deg
-                else:   
-                    fitted_paras[0] *= 1e3    # d*Ms from A to mA, Hani from T to mT and J/m^2 to mJ/m^2
-                self.gui.param_list[i].setValue(fitted_paras[0])
-                self.gui.writeConsole(self.gui.param_list[i].param_name + " = " + str(fitted_paras[0]) + " " + self.gui.param_list[i].unit)
-                fitted_paras.pop(0)
-            self.gui.FOM_label.configure(text=str(FOM.round(8)))
-            self.gui.writeConsole("New FOM: " + str(FOM.round(8)))
+            self.observer.newBestFit(FOM, {i: self.param_values[i] for i in self.fit_para_ind}, M_tot_plot)
         return FOM
     
 
+    def fit_cost_grad(self, paras):
+        # cost function of the polish, which returns the FOM together with its analytic gradient with respect to the fit parameters
+        # one simulation gives the equilibrium angles, from which the sensitivities of M(H) follow without any extra minimization
+        self.compute_gradient = True
+        try:
+            FOM = self.fit_cost(paras)
+        finally:
+            self.compute_gradient = False
+        grad = np.array(self.FOM_grad)
+        # the follower of linked parameters moves opposite to its master
+        if self.linkedParas == True: grad[self.masterParaID] -= grad[self.followerParaID]
+        return FOM, grad[self.fit_para_ind]
+
+
+    def ensembleSupported(self):
+        # calculateMHEnsemble only implements the sequential sweep of the built-in newton solver
+        return self.solver != "scipy" and self.adaptive_step != "on" and not self.warm_start and not self.instrument
+
+
+    def fit_cost_ensemble(self, population):
+        # vectorized cost function of the differential evolution, population has the shape (number of fit parameters, K)
+        results = self.calculateMHEnsemble(np.transpose(population))
+        if len(results) == 0: raise Exception # if we pressed the stop button, we raise an Exception to stop fitting
+
+        FOMs = np.empty(len(results))
+        for k, result in enumerate(results):
+            M_tot_FOM = result[1] if self.use_sim_field == "on" and len(self.exp_H) > 0 else result[0]
+            FOMs[k] = self.fom(M_tot_FOM)
+        k = int(np.argmin(FOMs))
+        if FOMs[k] < self.best_FOM:
+            self.best_FOM = FOMs[k]
+            self.observer.newBestFit(FOMs[k], dict(zip(self.fit_para_ind, population[:, k])), results[k][0])
+        return FOMs
+
+
+    def evaluateFOM(self, paras):
+        # cost function without any reporting, which is sent to the worker processes during a parallel fit
+        result = self.simulateFOM(paras)
+        if result is None: return np.inf  # we pressed the stop button
+        return result[0]
+
+
+    def simulateFOM(self, paras):
+        # simulates M(H) for the fit parameters paras and returns its FOM and the M(H) loops to plot, or None if the simulation was stopped
+        if self.use_sim_field == "on":
+            result = self.calculateMH(self.sim_H, paras)
+            if len(result) == 0: return None
+            M_tot_plot, M_tot_FOM, phiA, phiB = result
+        else:
+            result = self.calculateMH(self.sim_H, paras)
+            if len(result) == 0: return None
+            M_tot_plot, phiA, phiB = result
+            M_tot_FOM = M_tot_plot
+        if self.compute_gradient:
+            FOM, self.FOM_grad = self.fom.gradient(M_tot_FOM, self.dM_FOM)
+            return FOM, M_tot_plot
+        return self.fom(M_tot_FOM), M_tot_plot
+
+
+    def globalFitCallback(self, intermediate_result):
+        # called in the main process after each generation of the parallel differential evolution
+        if self.observer.stopRequested():
+            self.fit_stopped = True
+            return True     # stops the differential evolution
+        if intermediate_result.fun < self.best_FOM:
+            self.fit_cost(intermediate_result.x)    # re-simulates the best parameters once to update plot, parameters and console
+
+
     def calculateMH(self, h_sweep=[], *paras):
         # First we setup some things for the Progress Bar
         # Also if we fit, h_sweep is given by o.curve_fit to this function, 
         # otherwise if we just simulate we need to get it from the class initialization
-        if self.fitting == True and self.gui is not None:
+        if self.fitting == True:
             txt = self.cur_fit_type + " Fit (iteration " + str(self.fit_iteration) + ")"
-            self.gui.prog_bar_label.configure(text=txt)
+            self.observer.setProgressLabel(txt)
             self.fit_iteration += 1
         elif self.fitting == False:
             h_sweep = self.sim_H
-            if self.gui is not None: self.gui.prog_bar_label.configure(text="Simulation Progress Bar")
-        last_progbar_update = 0
-        update_interval = int(len(h_sweep) * 20 / 800)
+            self.observer.setProgressLabel("Simulation Progress Bar")
 
         # here we put the parameters, which are being fitted and being given by o.curve_fit, back into self.param_values
         if len(paras) > 0 and len(self.fit_para_ind) > 0:
@@ -142,142 +510,634 @@ class MacrospinModel():
                 fit_paras_copy.pop(0)
             if self.linkedParas == True: self.updateLinkedParas()
 
+        # a loop which was already simulated for the same parameters is taken from the cache (unless we want to measure the solver)
+        if self.cache is not None and not self.instrument:
+            cache_key = self.getCacheKey(h_sweep)
+            # the entry stores the sensitivities if its simulation computed them, only a gradient request needs them
+            cached = self.cache.get(cache_key, accept=(lambda entry: entry[1] is not None) if self.compute_gradient else None)
+            if cached is not None:
+                self.observer.setProgress(1)
+                result, self.dM_FOM = cached
+                return result
+
+        # the stored trajectory of the nearest parameters is the starting guess of every field step
+        # (not while the solver log is recorded, which measures the sequential field steps)
+        self.warm_guess = self.getWarmGuess(h_sweep) if self.warm_start and not self.instrument else None
+
+        # the sweeps of the different field angles phiH are independent of each other, so they can run in a process pool
+        if self.usePool(h_sweep):
+            sweeps = self.sweepPhiHsParallel(h_sweep)
+        else:
+            sweeps = []
+            for j in range(len(self.phiHs)):
+                sweeps.append(self.sweepPhiH(j, h_sweep))
+                if sweeps[-1] is None: break
+        if not self.fitting: self.shutdownPool()
+        if None in sweeps:
+            # we pressed the stop button
+            self.observer.setProgress(0)
+            return []
+        self.observer.setProgress(1)
+
         M_tot_plot, M_tot_FOM, phiA_tot, phiB_tot = [], [], [], []
-        for j in range(len(self.phiHs)):
-            self.phiH = self.phiHs[j]
-            M, M_FOM, phiA, phiB = [], [], [], []
-            phiA_i, phiB_i = self.phiH, self.phiH   # we start from saturation so the first macrospin angles are identical to phiH
-
-            for i, h in enumerate(h_sweep):
-                # check if progress bar should be update
-                if (i+1)*(j+1) == (len(h_sweep)*len(self.phiHs)) and self.gui is not None:
-                    self.gui.prog_bar.set(1)
-                elif i - last_progbar_update == update_interval and self.gui is not None:
-                    if self.gui.stopDaemon_bool == True:
-                        self.gui.stopDaemon_bool = False
-                        self.gui.prog_bar.set(0)
-                        return []
-                    self.gui.prog_bar.set((i+1)/(len(h_sweep)*len(self.phiHs)) + j/len(self.phiHs))
-                    last_progbar_update = i
-
-                # flip phiH by 180° if we go to negative field values
-                phiH_at_h = normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH
-
-                # find local minimum in G(phiA, phiB) for new external field value, using the previous macrospin angles (phiA, phiB) as initial parameters
-                phiAB_new = o.minimize(self.get_G, (phiA_i, phiB_i), args=(h, phiH_at_h), method="newton-cg", jac=True, hess=self.get_G_hess, options={"xtol": 1e-12})
-                
-                # check whether we are stuck on a saddle point / local maxima
-                if math.isclose(phiAB_new.x[0], phiA_i, abs_tol=1e-2) and math.isclose(phiAB_new.x[1], phiB_i, abs_tol=1e-2):   # absolute tolerance is 0.6°
-                    inc = np.pi/180     # 1° in radians
-                    guesses = [(phiA_i+inc, phiB_i), (phiA_i, phiB_i+inc), (phiA_i-inc, phiB_i), (phiA_i, phiB_i-inc), 
-                            (phiA_i+inc, phiB_i+inc), (phiA_i-inc, phiB_i+inc), (phiA_i-inc, phiB_i-inc), (phiA_i+inc, phiB_i-inc)]
-                    g, dg = self.get_G((phiA_i, phiB_i), h, phiH_at_h)
-                    d2g, det = self.get_G_hess((phiA_i, phiB_i), h, phiH_at_h, type="det")
-                    best_guess = [(phiA_i, phiB_i), dg, d2g, det]
-                    while (abs(dg[0]) < 1E-5 and abs(dg[1]) < 1E-5) and det <= 0 or (det > 0 and d2g[0,0] < 0):
-                        # we are either on a maximum or saddle point
-                        for guess in guesses:
-                            g, dg = self.get_G(guess, h, phiH_at_h)
-                            d2g, det = self.get_G_hess(guess, h, phiH_at_h, type="det")
-                            if d2g[0,0] > 0:
-                                best_guess = [guess, dg, d2g, det]
-                                break
-                        inc += np.pi/180
-                        guesses = [(phiA_i+inc, phiB_i), (phiA_i, phiB_i+inc), (phiA_i-inc, phiB_i), (phiA_i, phiB_i-inc),
-                                (phiA_i+inc, phiB_i+inc), (phiA_i-inc, phiB_i+inc), (phiA_i-inc, phiB_i-inc), (phiA_i+inc, phiB_i-inc)]
-                    phiAB_new = o.minimize(self.get_G, best_guess[0], args=(h, phiH_at_h), method="newton-cg", jac=True, hess=self.get_G_hess, options={"xtol": 1e-12})
-
-                M_at_H = self.get_MvH(phiAB_new.x, phiH_at_h)
-                M.append(M_at_H)
-                phiA_i = normalizeRadian(phiAB_new.x[0])       # set the current phiA value as the next starting guess for phiA
-                phiB_i = normalizeRadian(phiAB_new.x[1])       # set the current phiB value as the next starting guess for phiB
-                phiA.append(phiA_i)
-                phiB.append(phiB_i)
-
-            if self.full_hyst == "off":
-                if self.use_sim_field == "on" and len(self.exp_H) > 0:
-                    # get separate M which is interpolated to fit exp_H values for FOM calculation
-                    M_FOM = np.interp(self.exp_H[:self.exp_half_ind][::-1], self.sim_H[::-1], M[::-1])
-                    M_FOM = M_FOM[::-1]
-                    H_down_inv = [-h for h in self.exp_H[:self.exp_half_ind]]
-                    H_up_sweep = list(self.exp_H[self.exp_half_ind:])
-                    M_FOM_down_inv = [-m for m in M_FOM]
-                    M_FOM = np.append(M_FOM, np.interp(H_up_sweep, H_down_inv, M_FOM_down_inv))
-
-                    # mirror for M to plot
-                    M_up_sweep = [-m for m in M[1:]]
-                    M = list(np.append(M, M_up_sweep))
-                elif self.use_sim_field == "off" and len(self.exp_H) > 0:
-                    H_down_inv = [-h for h in self.exp_H[:self.exp_half_ind]]
-                    M_down_inv = [-m for m in M]
-                    H_up_sweep = list(self.exp_H[self.exp_half_ind:])
-                    M = np.append(M, np.interp(H_up_sweep, H_down_inv, M_down_inv))
-                elif len(self.exp_H) == 0:
-                    M_up_sweep = [-m for m in M[1:]]
-                    M = list(np.append(M, M_up_sweep))
-            elif self.full_hyst == "on" and self.use_sim_field == "on" and len(self.exp_H) > 0:
-                sim_half_ind = self.sim_H.index(min(self.sim_H))
-                M_down = np.interp(self.exp_H[:self.exp_half_ind][::-1], self.sim_H[:sim_half_ind][::-1], M[:sim_half_ind][::-1])
-                M_up = np.interp(self.exp_H[self.exp_half_ind:], self.sim_H[sim_half_ind:], M[sim_half_ind:])
-                M_FOM = np.append(M_down[::-1], M_up)
-
-            # convert from radians to deg for plotting purposes
-            phiA = [p * 180 / np.pi for p in phiA]
-            phiB = [p * 180 / np.pi for p in phiB]
+        if self.instrument: self.solver_log = self.getSolverLog([sweep[5]["steps"] for sweep in sweeps])
+        self.dM_FOM = [sweep[4] for sweep in sweeps] if self.compute_gradient else None
+        for M, M_FOM, phiA, phiB, dM_FOM, sweep_stats in sweeps:
+            for key in self.escape_stats: self.escape_stats[key] += sweep_stats[key]
+            for key in self.warm_stats: self.warm_stats[key] += sweep_stats.get(key, 0)
             M_tot_plot.append(M)
             if self.use_sim_field == "on" and len(self.exp_H) > 0: 
                 M_tot_FOM.append(M_FOM)
             phiA_tot.append(phiA)
             phiB_tot.append(phiB)
-            last_progbar_update = 0
         if self.use_sim_field == "on" and len(self.exp_H) > 0:
-            return M_tot_plot, M_tot_FOM, phiA_tot, phiB_tot
+            result = M_tot_plot, M_tot_FOM, phiA_tot, phiB_tot
         else:
-            return M_tot_plot, phiA_tot, phiB_tot
+            result = M_tot_plot, phiA_tot, phiB_tot
+        if self.warm_start: self.storeTrajectory(h_sweep, phiA_tot, phiB_tot)
+        if self.cache is not None: self.cache.put(cache_key, (result, self.dM_FOM))
+        return result
 
 
-    def get_G(self, phis, h, phiH=None):
-        if phiH == None:
-            phiH = normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH
-        phiA, phiB = phis
-        d_Ms_A, hani_A, phiani_A, J1, J2, d_Ms_B, hani_B, phiani_B = self.param_values[:8]
+    def calculateMHEnsemble(self, population, h_sweep=None):
+        # simulates M(H) for K fit parameter vectors (population: K x number of fit parameters) at once
+        # the K states (phiA, phiB) are advanced through the sweep together, so energy, gradient and Newton steps are array operations
+        # over all members (see newtonMinimizeEnsemble). Only members stuck on a saddle point or handed over to newton-cg are solved one by one.
+        # returns a list with the calculateMH result of every member or [] if the stop button was pressed
+        if not self.ensembleSupported(): raise ValueError("calculateMHEnsemble doesn't support solver=\"scipy\", adaptive_step, warm_start or instrument")
+        if h_sweep is None: h_sweep = self.sim_H
+        K, n = len(population), len(h_sweep)
+        if self.fitting == True:
+            self.observer.setProgressLabel(self.cur_fit_type + " Fit (iterations " + str(self.fit_iteration) + "-" + str(self.fit_iteration + K - 1) + ")")
+            self.fit_iteration += K
 
-        # calculate energy
-        g_A = - d_Ms_A * (abs(h) * np.cos(phiA - phiH) + 0.5 * hani_A * (np.cos(phiA - phiani_A))**2)
-        g_B = - d_Ms_B * (abs(h) * np.cos(phiB - phiH) + 0.5 * hani_B * (np.cos(phiB - phiani_B))**2)
-        g_RKKY = - (J1 * np.cos(phiA - phiB) + J2 * (np.cos(phiA - phiB))**2)
-        g = g_A + g_B + g_RKKY
+        # parameter sets of all members, members which were already simulated are taken from the cache
+        base_values = self.param_values
+        members, results, cache_keys = [], [None] * K, [None] * K
+        for k, paras in enumerate(population):
+            self.param_values = list(base_values)
+            for i, p in zip(self.fit_para_ind, paras): self.param_values[i] = p
+            if self.linkedParas == True: self.updateLinkedParas()
+            members.append(self.param_values)
+            if self.cache is not None:
+                cache_keys[k] = self.getCacheKey(h_sweep)
+                cached = self.cache.get(cache_keys[k])
+                if cached is not None: results[k] = cached[0]
+        self.param_values = base_values
+        todo = [k for k in range(K) if results[k] is None]
+        if len(todo) == 0: return results
 
-        # calculate gradients along phiA and phiB
-        dg_phiA = d_Ms_A * (abs(h) * np.sin(phiA - phiH) + 0.5 * hani_A * np.sin(2*(phiA - phiani_A))) + J1 * np.sin(phiA-phiB) + J2 * np.sin(2*phiA-2*phiB)
-        dg_phiB = d_Ms_B * (abs(h) * np.sin(phiB - phiH) + 0.5 * hani_B * np.sin(2*(phiB - phiani_B))) - J1 * np.sin(phiA-phiB) - J2 * np.sin(2*phiA-2*phiB)
-        
-        # energy, jacobian and hessian is multiplied by 10 because it helps the minimizer
-        g *= 10
-        dg_phiA *= 10
-        dg_phiB *= 10
+        # the states of all members and field angles are advanced together, state s belongs to member todo[s // J] and field angle s % J
+        J = len(self.phiHs)
+        S = len(todo) * J
+        params = [np.repeat([members[k][i] for k in todo], J) for i in range(8)]
+        phiH_states = np.tile(np.asarray(self.phiHs, dtype=np.float64), len(todo))
+        phiA, phiB = phiH_states.copy(), phiH_states.copy()    # we start from saturation
+        phiA_sweep, phiB_sweep, phiH_sweep = np.empty((S, n)), np.empty((S, n)), np.empty((S, n))
+        self.sweep_stats = {"escapes": 0, "evaluations": 0, "iterations": 0}
+        update_interval = max(int(n * 20 / 800), 1)
+        for i, h in enumerate(h_sweep):
+            if i % update_interval == 0:
+                if self.observer.stopRequested():
+                    self.observer.setProgress(0)
+                    return []
+                self.observer.setProgress(i/n)
+
+            phiH_at_h = normalizeRadianArray(phiH_states + np.pi) if h < 0 else phiH_states
+            res = newtonMinimizeEnsemble(params, phiA, phiB, h, phiH_at_h, maxiter=self.newton_maxiter, xtol=self.newton_xtol)
+
+            # states which minimizeG would hand over to newton-cg are solved one by one like in calculateMH
+            change = np.abs(res.x - np.stack((phiA, phiB), axis=-1))
+            handover = ~res.success | np.any(change >= 0.1, axis=-1)
+            for s_ind in np.flatnonzero(handover):
+                self.param_values = members[todo[s_ind // J]]
+                res.x[s_ind] = self.solveAtField(phiA[s_ind], phiB[s_ind], h, phiH_at_h[s_ind])[:2]
+
+            # the other states which are stuck on a saddle point / local maxima (same check as in solveAtField) are escaped one by one
+            stuck = ~handover & np.all(change <= 1e-2, axis=-1)
+            det = res.hess[:, 0, 0] * res.hess[:, 1, 1] - res.hess[:, 0, 1]**2
+            flat = (np.abs(res.jac[:, 0]) < 1E-5) & (np.abs(res.jac[:, 1]) < 1E-5)
+            for s_ind in np.flatnonzero(stuck & ((flat & (det <= 0)) | ((det > 0) & (res.hess[:, 0, 0] < 0)))):
+                self.param_values = members[todo[s_ind // J]]
+                res.x[s_ind] = self.escapeStall(o.OptimizeResult(x=res.x[s_ind], nit=res.nit[s_ind]), h, phiH_at_h[s_ind])[0].x
+            self.param_values = base_values
+
+            phiA, phiB = normalizeRadianArray(res.x[:, 0]), normalizeRadianArray(res.x[:, 1])
+            phiA_sweep[:, i], phiB_sweep[:, i], phiH_sweep[:, i] = phiA, phiB, phiH_at_h
+        self.observer.setProgress(1)
+        for key in self.escape_stats: self.escape_stats[key] += self.sweep_stats[key]
+
+        M_sweep = np.copysign(1, phiH_sweep) * (params[0][:, None] * np.cos(phiA_sweep - phiH_sweep) + params[5][:, None] * np.cos(phiB_sweep - phiH_sweep))
+        sweeps = [[] for k in todo]
+        for s_ind in range(S):
+            M, M_FOM = self.mirrorSweep(list(M_sweep[s_ind]))
+            sweeps[s_ind // J].append((M, M_FOM, list(phiA_sweep[s_ind] * 180 / np.pi), list(phiB_sweep[s_ind] * 180 / np.pi)))
+
+        # the same result format as calculateMH
+        for k, member_sweeps in zip(todo, sweeps):
+            M_tot_plot, M_tot_FOM, phiA_tot, phiB_tot = [list(l) for l in zip(*member_sweeps)]
+            if self.use_sim_field == "on" and len(self.exp_H) > 0:
+                results[k] = M_tot_plot, M_tot_FOM, phiA_tot, phiB_tot
+            else:
+                results[k] = M_tot_plot, phiA_tot, phiB_tot
+            if self.cache is not None: self.cache.put(cache_keys[k], (results[k], None))
+        return results
+
+
+    def getCacheKey(self, h_sweep):
+        # the parameters are quantized to 12 significant digits, so rounding noise doesn't matter 
+        # but the finite difference steps of L-BFGS-B (1e-8) are still separated
+        paras = tuple(float("%.12g" % p) for p in self.param_values[:8])
+        grids = (np.asarray(h_sweep, dtype=np.float64).tobytes(), np.asarray(self.exp_H, dtype=np.float64).tobytes(), tuple(self.phiHs))
+        # warm_start isn't part of the key, because a warm started step is only kept if it agrees with the sequential one
+        options = (self.full_hyst, self.use_sim_field, self.solver, self.newton_maxiter, self.newton_xtol,
+                   self.adaptive_step, self.adaptive_tol, self.adaptive_max_stride)
+        return paras, grids, options
+
+
+    def getWarmGuess(self, h_sweep):
+        # angles (in rad) of all field angles of the stored trajectory on the same field grid, whose parameters are closest to the current ones
+        # the parameters are compared in units of para_scale, returns None if there is no such trajectory
+        grid = (np.asarray(h_sweep, dtype=np.float64).tobytes(), tuple(self.phiHs))
+        paras = np.array(self.param_values[:8], dtype=np.float64) / [5e-3, 1e-3, 1, 1e-4, 1e-4, 5e-3, 1e-3, 1]
+        best, best_dist = None, np.inf
+        for trajectory_paras, trajectory_grid, phiA, phiB in self.trajectories:
+            if trajectory_grid != grid: continue
+            dist = np.sum((trajectory_paras - paras)**2)
+            if dist < best_dist: best, best_dist = (phiA, phiB), dist
+        return best
+
+
+    def storeTrajectory(self, h_sweep, phiA, phiB):
+        # phiA, phiB in deg like calculateMH returns them, the oldest trajectory is dropped once warm_start_size are stored
+        grid = (np.asarray(h_sweep, dtype=np.float64).tobytes(), tuple(self.phiHs))
+        paras = np.array(self.param_values[:8], dtype=np.float64) / [5e-3, 1e-3, 1, 1e-4, 1e-4, 5e-3, 1e-3, 1]
+        self.trajectories.append((paras, grid, [np.radians(p) for p in phiA], [np.radians(p) for p in phiB]))
+        if len(self.trajectories) > self.warm_start_size: self.trajectories.pop(0)
 
-        return g, (dg_phiA, dg_phiB)
+
+    def sweepPhiH(self, j, h_sweep):
+        # simulates the hysteresis for the j-th field angle in self.phiHs
+        # returns M, M_FOM, phiA, phiB, the sensitivities dM_FOM and the saddle escape statistics of this field angle or None if the stop button was pressed
+        self.phiH = self.phiHs[j]
+        self.sweep_stats = {"escapes": 0, "evaluations": 0, "iterations": 0, "warm_steps": 0, "fallbacks": 0}
+        if self.instrument: self.sweep_stats["steps"] = []
+        if self.warm_guess is not None:
+            angles = self.sweepAnglesWarm(j, h_sweep)
+        elif self.adaptive_step == "on":
+            angles = self.sweepAnglesAdaptive(j, h_sweep)
+        else:
+            angles = self.sweepAngles(j, h_sweep)
+        if angles is None: return None
+        phiA, phiB, phiH_sweep = angles
+        M = [self.get_MvH((phiA[i], phiB[i]), phiH_sweep[i]) for i in range(len(h_sweep))]
+
+        M, M_FOM = self.mirrorSweep(M)
+        dM_FOM = None
+        if self.compute_gradient:
+            # sensitivities of the M(H) used for the FOM to all 8 parameters, they are mirrored / interpolated exactly like M itself
+            dM = self.getSensitivities(phiA, phiB, h_sweep, phiH_sweep)
+            dM_FOM = []
+            for k in range(dM.shape[1]):
+                dM_plot_k, dM_FOM_k = self.mirrorSweep(list(dM[:, k]))
+                dM_FOM.append(dM_FOM_k if self.use_sim_field == "on" and len(self.exp_H) > 0 else dM_plot_k)
+            dM_FOM = np.stack(dM_FOM, axis=-1)
+
+        # convert from radians to deg for plotting purposes
+        phiA = [p * 180 / np.pi for p in phiA]
+        phiB = [p * 180 / np.pi for p in phiB]
+        return M, M_FOM, phiA, phiB, dM_FOM, self.sweep_stats
+
+
+    def sweepAngles(self, j, h_sweep):
+        # solves the equilibrium angles at every field value of h_sweep for the field angle self.phiH
+        # returns phiA, phiB (in radians) and the field angles at h or None if the stop button was pressed
+        phiA, phiB, phiH_sweep = [], [], []
+        phiA_i, phiB_i = self.phiH, self.phiH   # we start from saturation so the first macrospin angles are identical to phiH
+        last_progbar_update = 0
+        update_interval = max(int(len(h_sweep) * 20 / 800), 1)
+
+        for i, h in enumerate(h_sweep):
+            # check if progress bar should be update
+            if i - last_progbar_update == update_interval:
+                if self.stopRequested():
+                    return None
+                self.setSweepProgress(j, (i+1)/len(h_sweep))
+                last_progbar_update = i
+
+            # flip phiH by 180° if we go to negative field values
+            phiH_at_h = normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH
+
+            # find local minimum in G(phiA, phiB) for new external field value, using the previous macrospin angles (phiA, phiB) as initial parameters
+            phiA_i, phiB_i, escaped = self.solveAtField(phiA_i, phiB_i, h, phiH_at_h)
+            phiA.append(phiA_i)
+            phiB.append(phiB_i)
+            phiH_sweep.append(phiH_at_h)
+        return phiA, phiB, phiH_sweep
+
+
+    def sweepAnglesAdaptive(self, j, h_sweep):
+        # same as sweepAngles, but in regions where the angles change smoothly up to adaptive_max_stride points of h_sweep are skipped
+        # a stride is only accepted if the solved angles agree with the ones predicted from dphi/dh and the hessian doesn't soften
+        # (which happens in front of spin-flops and switching events), otherwise the stride is halved down to single steps
+        # the skipped points are filled by cubic hermite interpolation of the angles, so the result lives on the requested grid
+        n = len(h_sweep)
+        phiH_sweep = [normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH for h in h_sweep]
+        phiA, phiB = np.empty(n), np.empty(n)
+        phiA[0], phiB[0], escaped = self.solveAtField(self.phiH, self.phiH, h_sweep[0], phiH_sweep[0])
+        slope, lam = self.getFieldSlope(phiA[0], phiB[0], h_sweep[0], phiH_sweep[0])
+        i, stride = 0, 1
+        last_progbar_update = 0
+        update_interval = max(int(n * 20 / 800), 1)
+
+        while i < n - 1:
+            if i - last_progbar_update >= update_interval:
+                if self.stopRequested():
+                    return None
+                self.setSweepProgress(j, (i+1)/n)
+                last_progbar_update = i
+
+            s = min(stride, n - 1 - i)
+            while True:
+                k = i + s
+                phiA_k, phiB_k, escaped = self.solveAtField(phiA[i], phiB[i], h_sweep[k], phiH_sweep[k])
+                slope_k, lam_k = self.getFieldSlope(phiA_k, phiB_k, h_sweep[k], phiH_sweep[k])
+                if s == 1: break
+                dh = h_sweep[k] - h_sweep[i]
+                err = max(abs(normalizeRadian(phiA_k - phiA[i] - slope[0] * dh)), abs(normalizeRadian(phiB_k - phiB[i] - slope[1] * dh)))
+                if not escaped and err <= self.adaptive_tol and lam_k >= 0.5 * lam: break
+                s = s // 2
+
+            if s > 1:
+                # cubic hermite interpolation of the unwrapped angles between the points i and k
+                dh = h_sweep[k] - h_sweep[i]
+                t = (np.asarray(h_sweep[i+1:k]) - h_sweep[i]) / dh
+                h00, h10, h01, h11 = 2*t**3 - 3*t**2 + 1, t**3 - 2*t**2 + t, -2*t**3 + 3*t**2, t**3 - t**2
+                for phi, phi_k, m_i, m_k in ((phiA, phiA_k, slope[0], slope_k[0]), (phiB, phiB_k, slope[1], slope_k[1])):
+                    phi_k = phi[i] + normalizeRadian(phi_k - phi[i])
+                    phi[i+1:k] = [normalizeRadian(p) for p in h00 * phi[i] + h10 * dh * m_i + h01 * phi_k + h11 * dh * m_k]
+            phiA[k], phiB[k] = phiA_k, phiB_k
+            slope, lam = slope_k, lam_k
+            i = k
+            # grow the stride again after a successful step, but only if the state is a proper minimum
+            stride = min(2 * s, self.adaptive_max_stride) if lam > 0 else 1
+
+        return list(phiA), list(phiB), phiH_sweep
+
+
+    def sweepAnglesWarm(self, j, h_sweep):
+        # same as sweepAngles, but every field step starts from the stored trajectory warm_guess (of the nearest parameters) instead of the previous angles
+        # all field steps are independent then, so they are solved at once by newtonMinimizeEnsemble
+        # to stay on the branch of the sequential sweep, every step is solved a second time from the warm started angles of the previous step
+        # (which is exactly the sequential step) and only kept if both agree, otherwise a switching event has moved and the steps are solved
+        # sequentially from the previous angles, until they agree with the warm started ones again
+        n = len(h_sweep)
+        phiH_sweep = [normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH for h in h_sweep]
+        h, phiH = np.asarray(h_sweep, dtype=np.float64), np.asarray(phiH_sweep)
+        warm = newtonMinimizeEnsemble(self.param_values, self.warm_guess[0][j], self.warm_guess[1][j], h, phiH, maxiter=self.newton_maxiter, xtol=self.newton_xtol)
+        warm_A, warm_B = normalizeRadianArray(warm.x[:, 0]), normalizeRadianArray(warm.x[:, 1])
+        self.setSweepProgress(j, 0.3)
+        if self.stopRequested(): return None
+
+        # the sweep starts from saturation, i.e. both angles are phiH
+        prev_A, prev_B = np.concatenate(([self.phiH], warm_A[:-1])), np.concatenate(([self.phiH], warm_B[:-1]))
+        check = newtonMinimizeEnsemble(self.param_values, prev_A, prev_B, h, phiH, maxiter=self.newton_maxiter, xtol=self.newton_xtol)
+        hess = check.hess
+        minimum = (hess[:, 0, 0] * hess[:, 1, 1] - hess[:, 0, 1]**2 > 0) & (hess[:, 0, 0] > 0)
+        deviation = np.maximum(np.abs(normalizeRadianArray(check.x[:, 0] - warm_A)), np.abs(normalizeRadianArray(check.x[:, 1] - warm_B)))
+        consistent = warm.success & check.success & minimum & (deviation <= self.warm_start_tol)
+        self.setSweepProgress(j, 0.6)
+
+        phiA, phiB = warm_A.copy(), warm_B.copy()
+        in_sync = True
+        for i in range(n):
+            if in_sync and consistent[i]: continue
+            if self.stopRequested(): return None
+            phiA_i, phiB_i = (phiA[i-1], phiB[i-1]) if i > 0 else (self.phiH, self.phiH)
+            phiA[i], phiB[i], escaped = self.solveAtField(phiA_i, phiB_i, h_sweep[i], phiH_sweep[i])
+            self.sweep_stats["fallbacks"] += 1
+            in_sync = max(abs(normalizeRadian(phiA[i] - warm_A[i])), abs(normalizeRadian(phiB[i] - warm_B[i]))) <= self.warm_start_tol
+        self.sweep_stats["warm_steps"] += n - self.sweep_stats["fallbacks"]
+        return list(phiA), list(phiB), phiH_sweep
+
+
+    def solveAtField(self, phiA_i, phiB_i, h, phiH_at_h):
+        # finds the local minimum of G(phiA, phiB) at the field h next to the starting angles (phiA_i, phiB_i)
+        # returns the normalized angles and whether we had to escape from a saddle point / maximum first
+        if self.instrument: step = self.startStep()
+        phiAB_new = self.minimizeG(phiA_i, phiB_i, h, phiH_at_h)
+        nit = phiAB_new.nit
+        escaped = False
+
+        # check whether we are stuck on a saddle point / local maxima
+        if math.isclose(phiAB_new.x[0], phiA_i, abs_tol=1e-2) and math.isclose(phiAB_new.x[1], phiB_i, abs_tol=1e-2):   # absolute tolerance is 0.6°
+            phiAB_new, escaped = self.escapeStall(phiAB_new, h, phiH_at_h)
+        if self.instrument: self.recordStep(step, nit, phiAB_new, h, phiH_at_h)
+
+        # normalize the angles, so they can be used as the next starting guess
+        return normalizeRadian(phiAB_new.x[0]), normalizeRadian(phiAB_new.x[1]), escaped
+
+
+    def startStep(self):
+        # only called with instrument on: resets the counters of minimizeG and remembers the state at the beginning of a field step
+        self.step_evaluations = 0
+        self.step_hessians = 0
+        return time.perf_counter(), self.sweep_stats["escapes"], self.sweep_stats["evaluations"], self.sweep_stats["iterations"]
+
+
+    def recordStep(self, step, nit, result, h, phiH_at_h):
+        # one row of the solver log (see SOLVER_LOG_NAMES): time, minimizer iterations, energy / hessian evaluations,
+        # saddle escapes (and their line search evaluations) of this field step and whether the final minimization converged
+        start, escapes, escape_evaluations, iterations = step
+        duration = 1e3 * (time.perf_counter() - start)
+        M = self.get_MvH(result.x, phiH_at_h)
+        self.sweep_stats["steps"].append((self.phiH * 180/np.pi, h, M, duration, nit + self.sweep_stats["iterations"] - iterations,
+                                          self.step_evaluations + self.sweep_stats["evaluations"] - escape_evaluations, self.step_hessians,
+                                          self.sweep_stats["escapes"] - escapes, self.sweep_stats["evaluations"] - escape_evaluations, bool(result.success)))
+
+
+    def getSolverLog(self, steps):
+        # the recorded field steps of all field angles as {name: array} in the order of SOLVER_LOG_NAMES
+        rows = np.array([row for sweep_steps in steps for row in sweep_steps], dtype=np.float64).reshape(-1, len(SOLVER_LOG_NAMES))
+        return {name: rows[:, i] for i, name in enumerate(SOLVER_LOG_NAMES)}
+
+
+    def escapeStall(self, phiAB_new, h, phiH_at_h):
+        # the minimizer stalled at phiAB_new.x, if this is a saddle point or maximum, we escape from it and minimize again
+        # returns the new minimizer result and whether we had to escape
+        escaped = False
+        for attempt in range(3):
+            g, dg, hess = energyKernelScalar(self.param_values, phiAB_new.x[0], phiAB_new.x[1], h, phiH_at_h)
+            det = hess[0] * hess[1] - hess[2]**2
+            if not ((abs(dg[0]) < 1E-5 and abs(dg[1]) < 1E-5) and det <= 0 or (det > 0 and hess[0] < 0)): break
+            # we are either on a maximum or saddle point
+            escaped = True
+            escape_start = self.escapeSaddle(phiAB_new.x[0], phiAB_new.x[1], g, hess, h, phiH_at_h)
+            if escape_start is None: break     # G is flat around this point, so there is nothing to escape from
+            phiAB_new = self.minimizeG(escape_start[0], escape_start[1], h, phiH_at_h)
+            self.sweep_stats["escapes"] += 1
+            self.sweep_stats["iterations"] += int(phiAB_new.nit)
+        return phiAB_new, escaped
+
+
+    def escapeSaddle(self, phiA, phiB, g, hess, h, phiH_at_h):
+        # line search along the eigenvectors of the hessian (the one with the most negative curvature first) from a saddle point / maximum
+        # all steps from 1° to 128° in both directions are evaluated in one batch and the one with the lowest G is the new starting point
+        # returns None if no step lowers G
+        hAA, hBB, hAB = hess
+        eig_vals, eig_vecs = np.linalg.eigh(np.array([[hAA, hAB], [hAB, hBB]]))
+        steps = np.pi / 180 * 2.0**np.arange(8)
+        steps = np.concatenate((steps, -steps))
+        for n in range(2):
+            v = eig_vecs[:, n]
+            guesses_A, guesses_B = phiA + steps * v[0], phiB + steps * v[1]
+            g_k = energyKernel(self.param_values, guesses_A, guesses_B, h, phiH_at_h, order=0)
+            self.sweep_stats["evaluations"] += len(steps)
+            k = np.argmin(g_k)
+            if g_k[k] < g - 1e-14 * abs(g): return guesses_A[k], guesses_B[k]
+        return None
+
+
+    def getFieldSlope(self, phiA, phiB, h, phiH_at_h):
+        # derivatives dphiA/dh, dphiB/dh of the equilibrium angles from the implicit function theorem and the smallest eigenvalue of the hessian
+        # G only depends on h * cos(phi - phiH) with the unflipped phiH, so the slopes are continuous across h = 0
+        g, dg, (hAA, hBB, hAB) = energyKernelScalar(self.param_values, phiA, phiB, h, phiH_at_h)
+        det = hAA * hBB - hAB**2
+        lam = 0.5 * (hAA + hBB - math.sqrt((hAA - hBB)**2 + 4 * hAB**2))
+        if det <= 0: return (0, 0), lam
+        dg_dh_A = 10 * self.param_values[0] * math.sin(phiA - self.phiH)
+        dg_dh_B = 10 * self.param_values[5] * math.sin(phiB - self.phiH)
+        slope_A = - (hBB * dg_dh_A - hAB * dg_dh_B) / det
+        slope_B = - (hAA * dg_dh_B - hAB * dg_dh_A) / det
+        return (slope_A, slope_B), lam
+
+
+    def locateSwitchingFields(self, j=0, n_coarse=41, sat_tol=1e-3, jump_tol=1e-2, angle_tol=1e-2):
+        '''
+        Characteristic fields of the down sweep from +H_max to -H_max (H_max: largest field of sim_H) for the j-th field angle without a dense field grid.
+        The sweep follows the equilibrium branch with field steps of up to 2 * H_max / (n_coarse - 1). A step is only accepted if the solved angles
+        agree within angle_tol (in rad) with the ones predicted from dphi/dh and the previous step, otherwise it is bisected, and every bisection step
+        is one solve from the angles at the upper end. So metastable branches are followed like in a dense sweep (a coarse grid can jump over their end),
+        and a step which still fails at a width of 1e-9 * H_max is a jump. This isn't a cheap coarse scan: a sweep takes about 150 solves
+        plus about 30 for every jump (85 to 420 per field angle for typical SAFs), but unlike a coarse grid it doesn't miss metastable branches.
+        The saturation field is a smooth crossing of M, which is refined by regula falsi (Illinois) within a few solves.
+        Returns H_sat, the field below which M drops under (1 - sat_tol) * M_sat (nan if it is never saturated), and the fields H_sw (in T)
+        at which M jumps by more than jump_tol * M_sat, e.g. spin-flops or switching fields, together with the jumps dM_sw of M (in A).
+        '''
+        self.phiH = self.phiHs[j]
+        self.sweep_stats = {"escapes": 0, "evaluations": 0, "iterations": 0, "warm_steps": 0, "fallbacks": 0}
+        if self.instrument: self.sweep_stats["steps"] = []
+        M_sat = self.param_values[0] + self.param_values[5]
+        M_thr = (1 - sat_tol) * M_sat
+        H_max = max(abs(h) for h in self.sim_H)
+        H_res = 1e-9 * H_max
+        dh_max = 2 * H_max / (n_coarse - 1)
+
+        # a state on the branch is (h, (phiA, phiB), M, (dphiA/dh, dphiB/dh))
+        def solve(angles, h):
+            phiH_at_h = normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH
+            phiA, phiB, escaped = self.solveAtField(angles[0], angles[1], h, phiH_at_h)
+            # newton-cg, which takes over the steps with a nearly singular hessian (see minimizeG), stops short of the minimum in flat valleys,
+            # which would look like a deviation from the branch, so its angles are refined by Newton steps as long as the hessian is positive definite
+            refined = newtonMinimize(self.param_values, phiA, phiB, h, phiH_at_h, maxiter=self.newton_maxiter, xtol=self.newton_xtol, min_curvature=0)
+            if refined.success and abs(refined.x[0] - phiA) < 0.1 and abs(refined.x[1] - phiB) < 0.1: phiA, phiB = refined.x
+            slope, lam = self.getFieldSlope(phiA, phiB, h, phiH_at_h)
+            return h, (phiA, phiB), self.get_MvH((phiA, phiB), phiH_at_h), slope
+
+        def deviation(prev, a, b):
+            # b is on the branch of a, if its angles are predicted from a or hardly differ from the ones of a
+            # (dphi/dh diverges at a continuous transition, e.g. at the saturation field of a hard axis loop, where the
+            # old minimum turns into a saddle point, so a saddle escape alone doesn't mean that we left the branch)
+            # the prediction is the parabola through the previous state on the branch prev with the slope dphi/dh at a
+            dh = b[0] - a[0]
+            err, change = 0, 0
+            for k in range(2):
+                curvature = 0 if prev is None else (normalizeRadian(prev[1][k] - a[1][k]) - a[3][k] * (prev[0] - a[0])) / (prev[0] - a[0])**2
+                dphi = normalizeRadian(b[1][k] - a[1][k])
+                err, change = max(err, abs(dphi - a[3][k] * dh - curvature * dh**2)), max(change, abs(dphi))
+            return min(err, change)
+
+        state = solve((self.phiH, self.phiH), H_max)
+        prev, failed, dh, sat_bracket = None, None, dh_max, None
+        H_sw, dM_sw = [], []
+        while state[0] > -H_max:
+            if failed is not None and deviation(prev, state, failed) <= angle_tol:
+                # the step only failed because of the curvature of the branch
+                new, jump, failed = failed, False, None
+            elif failed is not None and state[0] - failed[0] <= H_res:
+                new, jump, failed = failed, True, None
+            else:
+                new = solve(state[1], 0.5 * (state[0] + failed[0]) if failed is not None else max(state[0] - dh, -H_max))
+                if deviation(prev, state, new) > angle_tol:
+                    failed = new
+                    continue
+                jump = False
+            if sat_bracket is None and state[2] >= M_thr > new[2]: sat_bracket = (state, new, jump)
+            if jump and abs(new[2] - state[2]) > jump_tol * M_sat:
+                H_sw.append(0.5 * (state[0] + new[0]))
+                dM_sw.append(new[2] - state[2])
+            # the deviation grows with the cube of the step, which sets the next step (up to 4 times longer)
+            step = state[0] - new[0]
+            dh = dh_max if jump else min(step * min(0.8 * (angle_tol / max(deviation(prev, state, new), 1e-16))**(1/3), 4), dh_max)
+            prev, state = None if jump else state, new
+
+        H_sat = np.nan
+        if sat_bracket is not None and sat_bracket[2]:
+            H_sat = 0.5 * (sat_bracket[0][0] + sat_bracket[1][0])
+        elif sat_bracket is not None:
+            # Illinois: regula falsi, which halves the value of an end that stays twice in a row
+            # a step which doesn't halve the bracket is followed by a bisection step
+            h_a, angles_a, f_a = sat_bracket[0][0], sat_bracket[0][1], sat_bracket[0][2] - M_thr
+            h_b, f_b = sat_bracket[1][0], sat_bracket[1][2] - M_thr
+            side, bisect = 0, False
+            while h_a - h_b > H_res:
+                width = h_a - h_b
+                h_m = 0.5 * (h_a + h_b) if bisect else h_a - f_a * (h_a - h_b) / (f_a - f_b)
+                if not h_b < h_m < h_a: h_m = 0.5 * (h_a + h_b)
+                h_m, angles_m, M_m, slope_m = solve(angles_a, h_m)
+                f_m = M_m - M_thr
+                # M isn't resolved better than the angles by the minimizer
+                if abs(f_m) <= self.newton_xtol * M_sat:
+                    h_a = h_b = h_m
+                    break
+                if f_m >= 0:
+                    h_a, angles_a, f_a = h_m, angles_m, f_m
+                    if side == 1: f_b *= 0.5
+                    side = 1
+                else:
+                    h_b, f_b = h_m, f_m
+                    if side == -1: f_a *= 0.5
+                    side = -1
+                bisect = h_a - h_b > 0.5 * width
+            H_sat = 0.5 * (h_a + h_b)
+        return H_sat, H_sw, dM_sw
+
+
+    def getRegionBoundaries(self, **kwargs):
+        # boundaries H1 (AFM-C) and H2 (C-FM) of the FOM regions in T for all field angles, see locateSwitchingFields for kwargs:
+        # H2 is the highest saturation field, H1 the lowest spin-flop field, i.e. the largest jump of M at a positive field below saturation
+        # H1 or H2 are nan if there is no spin-flop or saturation in the sweep
+        H1s, H2s = [], []
+        for j in range(len(self.phiHs)):
+            H_sat, H_sw, dM_sw = self.locateSwitchingFields(j, **kwargs)
+            if not np.isnan(H_sat): H2s.append(H_sat)
+            spin_flops = [(abs(dM), H) for H, dM in zip(H_sw, dM_sw) if H > 0 and not H > H_sat]
+            if len(spin_flops) > 0: H1s.append(max(spin_flops)[1])
+        return min(H1s) if len(H1s) > 0 else np.nan, max(H2s) if len(H2s) > 0 else np.nan
+
+
+    def mirrorSweep(self, M):
+        return mirrorSweep(M, self.sim_H, self.exp_H, full_hyst=self.full_hyst, use_sim_field=self.use_sim_field)
+
+
+    def sweepPhiHsParallel(self, h_sweep):
+        # runs sweepPhiH for all field angles in the process pool and puts the results back into the order of self.phiHs
+        # the workers write their progress into a shared array, so the progress bar keeps moving during the sweeps
+        pool = self.getPool()
+        for j in range(len(self.phiHs)): self.pool_progress[j] = 0
+        return self.poolMap(self.sweepPhiH, [j for j in range(len(self.phiHs))], [h_sweep] * len(self.phiHs), 
+                            progress=lambda done: sum(self.pool_progress) / len(self.phiHs))
+
+
+    def usePool(self, h_sweep):
+        # during a fit the pool is spawned once and kept alive between the simulations, a single simulation has to pay for the spawn
+        if self.workers <= 1 or len(self.phiHs) <= 1: return False
+        if self.fitting or self.pool is not None: return True
+        serial_time = len(self.phiHs) * len(h_sweep) * STEP_TIME.get(self.solver, STEP_TIME["newton"])
+        saved_time = serial_time * (1 - 1 / min(self.workers, len(self.phiHs)))
+        return saved_time > 2 * POOL_SPAWN_TIME
+
+
+    def getPool(self):
+        # the workers get a shared progress array and a shared stop flag, so the progress bar and the stop button keep working
+        if self.pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            self.pool_progress = ctx.Array("d", len(self.phiHs), lock=False)
+            self.pool_stop = ctx.Value("b", 0, lock=False)
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_initSweepWorker, initargs=(self.pool_progress, self.pool_stop))
+        return self.pool
+
+
+    def poolMap(self, func, *iterables, progress=None):
+        # map function for the process pool, which keeps the progress bar updated and forwards the stop button to the workers
+        # the progress bar shows the fraction of finished tasks, if no other progress function is given
+        pool = self.getPool()
+        self.pool_stop.value = 0
+        futures = [pool.submit(func, *args) for args in zip(*iterables)]
+        pending = set(futures)
+        while len(pending) > 0:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if self.observer.stopRequested():
+                self.pool_stop.value = 1    # the workers abort at their next progress update
+            n_done = len(futures) - len(pending)
+            self.observer.setProgress(progress(n_done) if progress is not None else n_done / len(futures))
+        return [future.result() for future in futures]
+
+
+    def stopRequested(self):
+        if _sweep_stop is not None:
+            return bool(_sweep_stop.value)     # we are running inside a worker of the process pool
+        return self.observer.stopRequested()
+
+
+    def setSweepProgress(self, j, progress):
+        if _sweep_progress is not None:
+            _sweep_progress[j] = progress
+        else:
+            self.observer.setProgress((progress + j)/len(self.phiHs))
+
+
+    def shutdownPool(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+
+    def __getstate__(self):
+        # the model is sent to the worker processes without its observer and without the process pool itself
+        state = self.__dict__.copy()
+        state["observer"] = ModelObserver()
+        state["pool"] = None
+        state["pool_progress"] = None
+        state["pool_stop"] = None
+        state["workers"] = 1    # no nested process pools inside the workers
+        state["cache"] = None   # the cache stays in this process
+        state["trajectories"] = []  # only the warm_guess of the current simulation is needed there
+        return state
+
+
+    def minimizeG(self, phiA, phiB, h, phiH):
+        # find the local minimum of G(phiA, phiB) next to the starting angles (phiA, phiB)
+        # the built-in newton solver hands all field steps over to newton-cg, on which the hessian gets (nearly) singular, it doesn't converge
+        # or it switches to another minimum (an angle changes by more than 0.1 rad), so the hysteresis is the one of newton-cg
+        if self.solver != "scipy":
+            result = newtonMinimize(self.param_values, float(phiA), float(phiB), float(h), float(phiH), maxiter=self.newton_maxiter, xtol=self.newton_xtol)
+            if self.instrument:
+                self.step_evaluations += result.nfev
+                self.step_hessians += result.nfev   # the built-in newton solver gets the hessian with every evaluation
+            if result.success and abs(result.x[0] - phiA) < 0.1 and abs(result.x[1] - phiB) < 0.1: return result
+        result = o.minimize(self.get_G, (phiA, phiB), args=(h, phiH), method="newton-cg", jac=True, hess=self.get_G_hess, options={"xtol": self.newton_xtol})
+        if self.instrument:
+            self.step_evaluations += result.nfev
+            self.step_hessians += result.nhev
+        return result
+
+
+    def get_G(self, phis, h, phiH=None):
+        if phiH is None:
+            phiH = normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH
+        phiA, phiB = phis
+        return energyKernel(self.param_values, phiA, phiB, h, phiH, order=1)
     
 
     def get_G_hess(self, phis, h, phiH=None, type=None):
-        if phiH == None:
+        if phiH is None:
             phiH = normalizeRadian(self.phiH + np.pi) if h < 0 else self.phiH
         phiA, phiB = phis
-        d_Ms_A, hani_A, phiani_A, J1, J2, d_Ms_B, hani_B, phiani_B = self.param_values[:8]
-
-        # calculate hessian
-        G_hess = np.zeros((2,2))
-        G_hess[0,0] = d_Ms_A * (abs(h) * np.cos(phiA - phiH) + hani_A * np.cos(2*(phiA - phiani_A))) + J1 * np.cos(phiA - phiB) + 2 * J2 * np.cos(2*phiA-2*phiB)    # d2G_dphiA2
-        G_hess[1,0] = - J1 * np.cos(phiA - phiB) - 2 * J2 * np.cos(2*phiA - 2*phiB)
-        G_hess[1,1] = d_Ms_B * (abs(h) * np.cos(phiB - phiH) + hani_B * np.cos(2*(phiB - phiani_B))) + J1 * np.cos(phiA - phiB) + 2 * J2 * np.cos(2*phiA-2*phiB)    # d2G_dphiB2
-        G_hess[0,1] = - J1 * np.cos(phiA - phiB) - 2 * J2 * np.cos(2*phiA - 2*phiB)
-
-        # energy, jacobian and hessian is multiplied by 10 because it helps the minimizer
-        G_hess *= 10
+        g, dg, G_hess = energyKernel(self.param_values, phiA, phiB, h, phiH)
 
         if type == "det":
-            det = G_hess[0,0] * G_hess[1,1] - G_hess[1,0] * G_hess[0,1]
+            det = G_hess[..., 0, 0] * G_hess[..., 1, 1] - G_hess[..., 1, 0] * G_hess[..., 0, 1]
             return G_hess, det
         else:
             return G_hess
@@ -291,4 +1151,44 @@ class MacrospinModel():
 
         M = sign * (d_Ms_A * np.cos(phiA - phiH) + d_Ms_B * np.cos(phiB - phiH))
 
-        return M
\ No newline at end of file
+        return M
+
+
+    def getSensitivities(self, phiA, phiB, h, phiH):
+        # derivatives dM/dp of the equilibrium magnetization with respect to the first 8 entries of param_values
+        # phiA, phiB, h and phiH are arrays of one sweep (phiH already flipped for h < 0), returns an array of shape (n, 8)
+        # at a minimum dG/dphi = 0, so the implicit function theorem gives dphi/dp = - hess^-1 * d2G/(dphi dp)
+        d_Ms_A, hani_A, phiani_A, J1, J2, d_Ms_B, hani_B, phiani_B = self.param_values[:8]
+        phiA, phiB, phiH = np.asarray(phiA), np.asarray(phiB), np.asarray(phiH)
+        h = np.abs(np.asarray(h, dtype=np.float64))
+        g, dg, d2g = energyKernel(self.param_values, phiA, phiB, h, phiH)
+
+        cos_AH, sin_AH = np.cos(phiA - phiH), np.sin(phiA - phiH)
+        cos_BH, sin_BH = np.cos(phiB - phiH), np.sin(phiB - phiH)
+        sin_2Aani, cos_2Aani = np.sin(2 * (phiA - phiani_A)), np.cos(2 * (phiA - phiani_A))
+        sin_2Bani, cos_2Bani = np.sin(2 * (phiB - phiani_B)), np.cos(2 * (phiB - phiani_B))
+        sin_AB, sin_2AB = np.sin(phiA - phiB), np.sin(2 * (phiA - phiB))
+
+        # d2G/(dphi dp), multiplied by 10 like the hessian
+        dg_dp = np.zeros(np.shape(phiA) + (2, 8))
+        dg_dp[..., 0, 0] = h * sin_AH + 0.5 * hani_A * sin_2Aani
+        dg_dp[..., 0, 1] = 0.5 * d_Ms_A * sin_2Aani
+        dg_dp[..., 0, 2] = - d_Ms_A * hani_A * cos_2Aani
+        dg_dp[..., 0, 3], dg_dp[..., 1, 3] = sin_AB, -sin_AB
+        dg_dp[..., 0, 4], dg_dp[..., 1, 4] = sin_2AB, -sin_2AB
+        dg_dp[..., 1, 5] = h * sin_BH + 0.5 * hani_B * sin_2Bani
+        dg_dp[..., 1, 6] = 0.5 * d_Ms_B * sin_2Bani
+        dg_dp[..., 1, 7] = - d_Ms_B * hani_B * cos_2Bani
+        dg_dp *= 10
+
+        # analytic inverse of the 2x2 hessian, points which are no proper minimum get no sensitivity
+        det = d2g[..., 0, 0] * d2g[..., 1, 1] - d2g[..., 0, 1] * d2g[..., 1, 0]
+        inv_det = np.divide(1, det, out=np.zeros_like(det), where=det > 0)
+        dphiA = - inv_det[..., None] * (d2g[..., 1, 1, None] * dg_dp[..., 0, :] - d2g[..., 0, 1, None] * dg_dp[..., 1, :])
+        dphiB = - inv_det[..., None] * (d2g[..., 0, 0, None] * dg_dp[..., 1, :] - d2g[..., 1, 0, None] * dg_dp[..., 0, :])
+
+        sign = np.copysign(1, phiH)[..., None]
+        dM = sign * (- d_Ms_A * sin_AH[..., None] * dphiA - d_Ms_B * sin_BH[..., None] * dphiB)
+        dM[..., 0] += sign[..., 0] * cos_AH
+        dM[..., 5] += sign[..., 0] * cos_BH
+        return dM
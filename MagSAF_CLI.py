@@ -0,0 +1,182 @@
+'''
+Command line interface of MagSAF to run simulations and fits without the GUI, e.g. as batch jobs on a compute node:
+
+python MagSAF_CLI.py parameters.txt exp_0deg.txt exp_90deg.txt --fit J1 J2 --precise --workers 4 --out results/sample_1
+
+The parameter file is the one written by "Export Parameters" in the GUI and the exp. data files are read like "Load Data" does.
+Without --fit (or without data files) only the M(H) loops are simulated. Written are the (fitted) parameters as parameter file,
+the M(H) loops and the macrospin angles as tables and a log with all console messages.
+'''
+import argparse
+import os
+import sys
+import signal
+import time
+import multiprocessing
+import numpy as np
+
+from MacrospinModel import MacrospinModel, SimulationCache
+from FigureOfMerit import FigureOfMerit
+from ModelObserver import CallbackObserver
+import DataIO
+
+
+# names of the 8 model parameters for --fit, --bounds and --link
+FIT_NAMES = ["dMs_A", "Hani_A", "phiAni_A", "J1", "J2", "dMs_B", "Hani_B", "phiAni_B"]
+# default fit boundaries of the GUI (in mA, mT, deg and mJ/m^2)
+DEFAULT_BOUNDS = [(1, 40), (0, 10), (0, 180), (-1.5, 0), (-0.5, 0), (1, 40), (0, 10), (0, 180)]
+
+
+def toSI(i, value):
+    # parameter i from the units of the GUI to SI units
+    return value * (np.pi/180) if i in (2, 7) else value * 1e-3
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(description="Headless simulations and fits of SAF hysteresis loops with the macrospin model.")
+    parser.add_argument("parameters", help="parameter file (as written by 'Export Parameters' in the GUI)")
+    parser.add_argument("data", nargs="*", help="exp. M(H) data files, one per field angle phiH of the parameter file")
+    parser.add_argument("--columns", nargs=2, default=["0", "1"], metavar=("H", "M"), help="H and M columns of the data files by index or name (default: 0 1)")
+    parser.add_argument("--fit", nargs="+", choices=FIT_NAMES, default=[], help="parameters to fit (without it, only a simulation is done)")
+    parser.add_argument("--precise", action="store_true", help="precise fit instead of fast fit")
+    parser.add_argument("--bounds", nargs="+", default=[], metavar="NAME=LOW:HIGH", help="fit boundaries in the units of the GUI, e.g. J1=-2:0")
+    parser.add_argument("--link", choices=["dMs_A", "dMs_B"], help="adjust this d*Ms to the fitted other one, so that Ms_tot * d_tot stays constant (only if dMs_A or dMs_B is fitted)")
+    parser.add_argument("--focus", choices=["none", "AFM", "C", "FM"], default="none", help="region of the FOM with more weight (needs H_afm-c and H_c-fm)")
+    parser.add_argument("--hmax", type=float, default=1000, help="max. simulation field in mT (default: 1000)")
+    parser.add_argument("--dh", type=float, default=2.5, help="simulation field step in mT (default: 2.5)")
+    parser.add_argument("--full-hyst", action="store_true", help="calculate the full hysteresis instead of mirroring the down sweep")
+    parser.add_argument("--use-sim-field", action="store_true", help="simulate on --hmax/--dh fields instead of the exp. fields")
+    parser.add_argument("--adaptive", action="store_true", help="adaptive field steps")
+    parser.add_argument("--warm-start", action="store_true", help="start each fit simulation from the angles of the nearest previously simulated parameters")
+    parser.add_argument("--ensemble", action="store_true", help="simulate each generation of the global fit at once")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument("--format", choices=["txt", "csv", "npz"], default="txt", help="format of the M(H) and angle tables (default: txt)")
+    parser.add_argument("--out", default=None, help="prefix of the output files (default: name of the parameter file + '_result')")
+    parser.add_argument("--quiet", action="store_true", help="don't print the console messages")
+    return parser.parse_args(argv)
+
+
+def run(args):
+    # returns the exit code: 0 success, 1 simulation / fit failed or was stopped, 2 invalid input
+    out = args.out if args.out is not None else os.path.splitext(args.parameters)[0] + "_result"
+    if os.path.dirname(out) != "": os.makedirs(os.path.dirname(out), exist_ok=True)
+    log = []
+    def writeConsole(text):
+        log.append(text)
+        if not args.quiet: print(text, flush=True)
+
+    # a SIGTERM of the batch system (or Ctrl+C) stops the running fit like the stop button of the GUI
+    stop = [False]
+    def requestStop(signum, frame): stop[0] = True
+    signal.signal(signal.SIGTERM, requestStop)
+    signal.signal(signal.SIGINT, requestStop)
+
+    try:
+        file_values = DataIO.readParameterFile(args.parameters)
+        param_values = DataIO.paramValuesFromFile(file_values)
+        d_tot = float(file_values[16]) * 1e-9       # total FM thickness in m
+        Ms_tot = float(file_values[15]) * 1e3       # total Ms in A/m
+        exp_M, exp_H, exp_H_steps = [], [], []
+        for filename in args.data:
+            exp_H, M, exp_H_steps = DataIO.loadExpData(filename, d_tot, H_column=args.columns[0], M_column=args.columns[1])
+            exp_M.append(M)
+        if len(exp_M) > 0 and len(exp_M) != len(param_values[8]):
+            raise ValueError("the parameter file has " + str(len(param_values[8])) + " field angles phiH, but " + str(len(exp_M)) + " data files were given")
+        bounds = [list(b) for b in DEFAULT_BOUNDS]
+        for bound in args.bounds:
+            name, values = bound.split("=")
+            bounds[FIT_NAMES.index(name)] = sorted(float(value) for value in values.split(":"))
+    except Exception as err:
+        print("Error: " + str(err), file=sys.stderr)
+        return 2
+    if param_values[3] == 0 and param_values[4] == 0:
+        print("Error: J1 and J2 are both zero, the simulation doesn't work in this case.", file=sys.stderr)
+        return 2
+
+    try:
+        H1, H2 = float(file_values[13]) / 1e3, float(file_values[14]) / 1e3    # T
+    except:
+        H1, H2 = None, None
+    full_hyst = "on" if args.full_hyst else "off"
+    use_sim_field = "on" if args.use_sim_field else "off"
+    sim_H, sim_H_plot = DataIO.buildSimH(exp_H, args.hmax / 1e3, args.dh / 1e3, full_hyst=full_hyst, use_sim_field=use_sim_field)
+    fom = FigureOfMerit(exp_M, exp_H, exp_H_steps, H1=H1, H2=H2, fit_focus=args.focus) if len(exp_M) > 0 else None
+    cache = SimulationCache(maxsize=256)
+    observer = CallbackObserver(stop=lambda: stop[0], console=writeConsole,
+                                best=lambda FOM, paras, M: writeConsole("New best FOM: " + str(FOM)))
+    options = dict(full_hyst=full_hyst, use_sim_field=use_sim_field, workers=max(args.workers, 1), cache=cache, adaptive_step="on" if args.adaptive else "off")
+    start = time.perf_counter()
+
+    # fit, if there is something to fit
+    if len(args.fit) > 0 and fom is not None:
+        fit_para_ind = sorted(FIT_NAMES.index(name) for name in args.fit)
+        fit_paras = [param_values[i] for i in fit_para_ind]
+        bnds = [[toSI(i, bounds[i][0]), toSI(i, bounds[i][1])] for i in fit_para_ind]
+        for i in fit_para_ind: param_values[i] = None
+        model = MacrospinModel(observer, sim_H, param_values, exp_H=exp_H, fit_paras=fit_paras, fit_para_ind=fit_para_ind, bnds=bnds,
+                               fit_type="precise fit" if args.precise else "fast fit", fom=fom, ensemble=args.ensemble,
+                               warm_start=args.warm_start, **options)
+        # like in the GUI, the d*Ms values are only linked if one of them is fitted
+        link = args.link is not None and (0 in fit_para_ind or 5 in fit_para_ind)
+        if args.link is not None and not link:
+            writeConsole("Neither dMs_A nor dMs_B is fitted, so --link is ignored.")
+        if link:
+            follower = FIT_NAMES.index(args.link)
+            model.addLinkedParas(sum=Ms_tot*d_tot, master=5 if follower == 0 else 0, follower=follower)
+        fitted_paras = model.fit()
+        if args.warm_start:
+            writeConsole("Warm-started field steps: " + str(model.warm_stats["warm_steps"]) + " (" + str(model.warm_stats["fallbacks"]) + " solved sequentially)")
+        if len(fitted_paras) == 0:
+            writeLog(out, log)
+            return 1
+        for i, value in zip(fit_para_ind, fitted_paras): param_values[i] = value
+        if link: param_values[follower] = Ms_tot*d_tot - param_values[5 if follower == 0 else 0]
+    elif len(args.fit) > 0:
+        writeConsole("No exp. data files given, so there is nothing to fit. Only simulating.")
+
+    # final simulation with the (fitted) parameters
+    model = MacrospinModel(observer, sim_H, param_values, exp_H=exp_H, **options)
+    result = model.calculateMH()
+    if len(result) == 0:
+        writeLog(out, log)
+        return 1
+    if use_sim_field == "on" and len(exp_H) > 0:
+        sim_M, sim_M_FOM, phiA, phiB = result
+    else:
+        sim_M, phiA, phiB = result
+        sim_M_FOM = sim_M
+    if fom is not None: writeConsole("FOM: " + str(fom(sim_M_FOM)))
+    writeConsole("Finished in " + str(round(time.perf_counter() - start, 2)) + " s")
+
+    # results: parameter file, M(H) loops and macrospin angles
+    file_values[:] = DataIO.parameterFileValues(param_values, Ms_A=file_values[1], d_A=file_values[2], Ms_B=file_values[8], d_B=file_values[9],
+                                                H1=file_values[13], H2=file_values[14], Ms_tot=file_values[15], d_tot=file_values[16])
+    DataIO.writeParameterFile(out + "_parameters.txt", file_values)
+    phiHs = [str(round(phiH*180/np.pi, 0)) for phiH in param_values[8]]
+    if d_tot != 0:
+        M_unit, M_columns = "[kA/m]", [1e-3 * np.asarray(M) / d_tot for M in sim_M]
+    else:
+        M_unit, M_columns = "[mA]", [1e3 * np.asarray(M) for M in sim_M]
+    DataIO.writeTable(out + "_MH." + args.format, ["H"] + ["M_(phiH=" + phiH + "°)" for phiH in phiHs], ["[T]"] + [M_unit] * len(sim_M),
+                      [sim_H_plot] + M_columns, format=args.format)
+    angle_names, angle_columns = [], []
+    for j, phiH in enumerate(phiHs):
+        angle_names += ["phi_top_(phiH=" + phiH + "°)", "phi_bot_(phiH=" + phiH + "°)"]
+        angle_columns += [phiA[j], phiB[j]]
+    DataIO.writeTable(out + "_angles." + args.format, ["H"] + angle_names, ["[T]"] + ["[deg]"] * len(angle_names), [sim_H] + angle_columns, format=args.format)
+    writeLog(out, log)
+    return 0
+
+
+def writeLog(out, log):
+    with open(out + "_log.txt", "w") as f:
+        f.write("\n".join(log) + "\n")
+
+
+def main(argv=None):
+    return run(parseArguments(argv))
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()    # needed for the process pool in a frozen executable
+    sys.exit(main())
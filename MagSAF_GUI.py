@@ -8,10 +8,15 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import threading
+import multiprocessing
 import numpy as np
 
 from GUI_elements import Parameter, ThicknessMsCalculator
-from MacrospinModel import MacrospinModel
+from MacrospinModel import MacrospinModel, SimulationCache, normalizeRadianArray, SOLVER_LOG_NAMES, SOLVER_LOG_UNITS
+from FigureOfMerit import FigureOfMerit
+from EnergyLandscape import EnergyLandscape
+import DataIO
+from ModelObserver import ModelObserver
 
 plt.style.use('dark_background')
 ctk.set_appearance_mode("Dark")
@@ -37,22 +42,35 @@ msize = 4
 phiA_colors = ["#ad007c", "#e80659", "#c90f0f"]
 phiB_colors = ["#eb690b", "#ebd10b", "#8ee111"]
 
+# one row per new best fit in the fit history of a project (fit = number of the fit run, the parameters in SI units)
+FIT_HISTORY_NAMES = ["fit", "FOM", "dMs_A", "Hani_A", "phiAni_A", "J1", "J2", "dMs_B", "Hani_B", "phiAni_B"]
 
-def normalizeRadian(phi):      # reduce angles to (-pi < phi < pi)
-    sign = np.sign(phi)
-    phi_mod = (sign*phi) % (2*np.pi)    # reduce it below 2 pi
-    if phi_mod >= np.pi:
-        phi_mod = phi_mod - (2*np.pi)   # reduce it to (-pi < phi_mod < pi)
-    p = sign*phi_mod
-    try:
-        return p[0]
-    except:
-        return p
 
 def closeApp():
     os.kill(os.getpid(), signal.SIGTERM)
 
 
+class GUIObserver(ModelObserver):
+    # connects the headless models to the progress bar, stop button, console, plot and parameters of the GUI
+    def __init__(self, gui):
+        self.gui = gui
+
+    def setProgress(self, value):
+        self.gui.prog_bar.set(value)
+
+    def setProgressLabel(self, text):
+        self.gui.prog_bar_label.configure(text=text)
+
+    def stopRequested(self):
+        return self.gui.stopDaemon_bool == True
+
+    def writeConsole(self, text):
+        self.gui.writeConsole(text)
+
+    def newBestFit(self, FOM, fitted_paras, sim_M):
+        self.gui.showBestFit(FOM, fitted_paras, sim_M)
+
+
 class GUI(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -200,11 +218,39 @@ class GUI(ctk.CTk):
         self.use_sim_field_txt = ctk.CTkLabel(self.bnds_frame, text="Use Sim Fields, not Exp Fields", font=(font_name, medium_font_size), anchor=tk.CENTER)
         self.use_sim_field_txt.grid(row=1, column=1, padx=pads, pady=pads, sticky="w")
 
+        self.n_workers = ctk.CTkEntry(self.bnds_frame, font=(font_name, medium_font_size), width=entry_w/2, validate="key")
+        self.n_workers.grid(row=2, column=0, padx=(2*pads, 0), pady=pads, sticky="e")
+        self.n_workers.insert(0, 1)
+        self.n_workers_txt = ctk.CTkLabel(self.bnds_frame, text="Worker Processes", font=(font_name, medium_font_size), anchor=tk.CENTER)
+        self.n_workers_txt.grid(row=2, column=1, padx=pads, pady=pads, sticky="w")
+
+        self.adaptive_step = ctk.CTkCheckBox(self.bnds_frame, text="", width=pads, onvalue="on", offvalue="off")
+        self.adaptive_step.grid(row=3, column=0, padx=(2*pads, 0), pady=pads, sticky="e")
+        self.adaptive_step_txt = ctk.CTkLabel(self.bnds_frame, text="Adaptive Field Steps", font=(font_name, medium_font_size), anchor=tk.CENTER)
+        self.adaptive_step_txt.grid(row=3, column=1, padx=pads, pady=pads, sticky="w")
+
+        self.ensemble_fit = ctk.CTkCheckBox(self.bnds_frame, text="", width=pads, onvalue=True, offvalue=False)
+        self.ensemble_fit.grid(row=4, column=0, padx=(2*pads, 0), pady=pads, sticky="e")
+        self.ensemble_fit_txt = ctk.CTkLabel(self.bnds_frame, text="Simulate Fit Generations at once", font=(font_name, medium_font_size), anchor=tk.CENTER)
+        self.ensemble_fit_txt.grid(row=4, column=1, padx=pads, pady=pads, sticky="w")
+
+        self.solver_log_check = ctk.CTkCheckBox(self.bnds_frame, text="", width=pads, onvalue=True, offvalue=False)
+        self.solver_log_check.grid(row=5, column=0, padx=(2*pads, 0), pady=pads, sticky="e")
+        self.solver_log_check_txt = ctk.CTkLabel(self.bnds_frame, text="Record Solver Log", font=(font_name, medium_font_size), anchor=tk.CENTER)
+        self.solver_log_check_txt.grid(row=5, column=1, padx=pads, pady=pads, sticky="w")
+
+        self.warm_start_check = ctk.CTkCheckBox(self.bnds_frame, text="", width=pads, onvalue=True, offvalue=False)
+        self.warm_start_check.grid(row=6, column=0, padx=(2*pads, 0), pady=pads, sticky="e")
+        self.warm_start_check_txt = ctk.CTkLabel(self.bnds_frame, text="Warm-start Fit Simulations", font=(font_name, medium_font_size), anchor=tk.CENTER)
+        self.warm_start_check_txt.grid(row=6, column=1, padx=pads, pady=pads, sticky="w")
+
         self.fit_focus_txt = ctk.CTkLabel(self.fit_focus_frame, text="Focus Fit on region", font=(font_name, medium_font_size))
         self.fit_focus_txt.grid(row=0, column=0, padx=(2*pads, 0), pady=pads, sticky="w")
         self.fit_focus = ctk.CTkComboBox(self.fit_focus_frame, values=["none", "AFM", "C", "FM"], width=80, state="readonly")
         self.fit_focus.grid(row=0, column=1, padx=(0, pads), pady=pads, sticky="w")
         self.fit_focus.set("none")
+        self.locate_H_but = ctk.CTkButton(self.fit_focus_frame, text="Locate Regions from Sim", font=(font_name, small_font_size), command=self.locateRegionBoundaries)
+        self.locate_H_but.grid(row=1, column=0, columnspan=2, padx=(2*pads, pads), pady=pads, sticky="w")
         self.fit_focus_frame.grid_remove()
 
         
@@ -215,6 +261,8 @@ class GUI(ctk.CTk):
         ctk.CTkLabel(self.procedure_frame, text="0. Load previous Parameters", font=(font_name, medium_font_size), anchor=tk.CENTER).grid(row=1, column=0, padx=(2*pads,pads), pady=pads, sticky="nw")
         self.load_paras_but = ctk.CTkButton(self.procedure_frame, text="Load Parameters", font=(font_name, small_font_size), command=self.loadParameters)
         self.load_paras_but.grid(row=1, column=1, padx=pads, pady=pads, sticky="n")
+        self.open_project_but = ctk.CTkButton(self.procedure_frame, text="Open Project", font=(font_name, small_font_size), command=self.openProject)
+        self.open_project_but.grid(row=1, column=2, padx=(pads, 2*pads), pady=pads, sticky="n")
 
         # Enter nominell, total film thickness
         self.more_frames = ctk.CTkFrame(self.procedure_frame, fg_color="transparent")
@@ -250,13 +298,16 @@ class GUI(ctk.CTk):
         self.fit_button.grid(row=5, column=2, padx=(pads, 2*pads), pady=pads, sticky="n")
         
         # Export data
-        ctk.CTkLabel(self.procedure_frame, text="5. Save the result", font=(font_name, medium_font_size), anchor=tk.CENTER).grid(row=6, column=0, padx=(2*pads,pads), pady=(pads, 2*pads), sticky="nw")
+        ctk.CTkLabel(self.procedure_frame, text="5. Save the result", font=(font_name, medium_font_size), anchor=tk.CENTER).grid(row=6, column=0, padx=(2*pads,pads), pady=pads, sticky="nw")
         self.export_MH_curve = ctk.CTkButton(self.procedure_frame, text="Export Plot", font=(font_name, small_font_size), command=self.exportPlotData)
-        self.export_MH_curve.grid(row=6, column=1, padx=pads, pady=(pads, 2*pads), sticky="n")
+        self.export_MH_curve.grid(row=6, column=1, padx=pads, pady=pads, sticky="n")
         self.export_parameters = ctk.CTkButton(self.procedure_frame, text="Export Parameters", font=(font_name, small_font_size), command=self.exportParameters)
-        self.export_parameters.grid(row=6, column=2, padx=(pads, 2*pads), pady=(pads, 2*pads), sticky="n")
+        self.export_parameters.grid(row=6, column=2, padx=(pads, 2*pads), pady=pads, sticky="n")
+        self.save_project_but = ctk.CTkButton(self.procedure_frame, text="Save Project", font=(font_name, small_font_size), command=self.saveProject)
+        self.save_project_but.grid(row=7, column=1, padx=pads, pady=(0, 2*pads), sticky="n")
 
-        self.disable_buttons = [self.load_paras_but, self.load_data_button, self.remove_data_button, self.sim_but, self.remove_sim_but, self.fit_button, self.export_MH_curve, self.export_parameters]
+        self.disable_buttons = [self.load_paras_but, self.open_project_but, self.load_data_button, self.remove_data_button, self.sim_but, self.remove_sim_but, self.fit_button, 
+                                self.export_MH_curve, self.export_parameters, self.save_project_but]
 
         # PROGRESS BAR
         self.kill_thread_but = ctk.CTkButton(self.prog_bar_frame, text="Stop Sim / Fit", font=(font_name, small_font_size), command=self.stopDaemon)
@@ -286,6 +337,9 @@ class GUI(ctk.CTk):
         self.EnergyFieldEntry.grid(row=1, column=4, padx=(pads, pads/2), pady=(pads, 0), sticky="e")
         ctk.CTkLabel(self.plot_options_frame, text="mT", font=(font_name, medium_font_size)).grid(row=1, column=5, padx=(0, pads), pady=(pads, 0), sticky="w")
         self.EnergyFieldValue = 0
+        self.EnergyGridBox = ctk.CTkComboBox(self.plot_options_frame, values=["3°", "1°", "0.5°"], width=70, state="readonly", command=self.changeEnergyGrid)
+        self.EnergyGridBox.grid(row=1, column=6, padx=pads, pady=(pads, 0), sticky="w")
+        self.EnergyGridBox.set("3°")
         self.cover_frame = ctk.CTkFrame(self.plot_options_frame, height=0)
         self.cover_frame.grid(row=1, column=0, columnspan=7, padx=pads, pady=(pads, 0), sticky="nsew")
 
@@ -332,7 +386,14 @@ class GUI(ctk.CTk):
         self.param_l_bnds = [param.getLowerBound() for param in self.param_list if type(param) == Parameter]
         self.param_u_bnds = [param.getUpperBound() for param in self.param_list if type(param) == Parameter]
         self.exp_M, self.exp_M_plot, self.exp_H, self.sim_H, self.sim_M = [], [], [], [], []
+        self.sim_H_plot, self.exp_H_steps = [], []
         self.phiA, self.phiB = [], []
+        self.solver_log = None
+        self.fit_history, self.fit_number = [], 0
+        self.project_filename = None
+        self.fom, self.fom_settings = None, None
+        self.energy_landscape, self.energy_landscape_settings = None, None
+        self.sim_cache = SimulationCache(maxsize=256)   # shared by all simulations / fits, so e.g. the final simulation after a fit isn't solved again
         self.cur_plot = "M(H)"
         self.stopDaemon_bool = False
 
@@ -439,7 +500,7 @@ class GUI(ctk.CTk):
         self.fig_ax.set_ylabel("d*M (mA)", fontsize=15*GUI_scale)
         self.fig_ax.set_xlabel("µ{0}H (T)".format(chr(0x2080)), fontsize=15*GUI_scale)
         if len(self.exp_H) > 0:
-            x_max = max(self.exp_H) * 1.1
+            x_max = np.max(self.exp_H) * 1.1
             xlim = (-x_max, x_max) if rescale == True else cur_xlim
             self.fig_ax.set_xlim(xlim)
         elif len(self.sim_H) > 0:
@@ -459,7 +520,7 @@ class GUI(ctk.CTk):
             if i < exp_len:
                 exp_plot = self.fig_ax.plot(self.exp_H, self.exp_M_plot[i], color=exp_colors[i], marker=markers[i], markersize=msize, label="exp #" + str(i+1))
                 self.exp_plots.append(exp_plot)
-                ylim.append( 1.1 * max(self.exp_M_plot[i])) if rescale == True else cur_ylim
+                ylim.append( 1.1 * np.max(self.exp_M_plot[i])) if rescale == True else cur_ylim
             if i < sim_len:
                 if len(self.param_values[8]) == sim_len:
                     label_txt = "sim " + str(round(self.param_values[8][i]*180/np.pi, 1)) + "°"
@@ -467,6 +528,16 @@ class GUI(ctk.CTk):
                 self.sim_plots.append(sim_plot)
                 ylim.append(1.1 * max(self.sim_M_plot[i])) if rescale == True else cur_ylim
 
+        # solver log overlay: field steps with saddle escapes, without convergence and the slowest ones (> 5x the median time)
+        if self.solver_log is not None and sim_len > 0 and len(self.solver_log["H"]) > 0:
+            log = self.solver_log
+            slow = log["time"] > 5 * np.median(log["time"])
+            for mask, style, label in ((slow, dict(color="orange", marker="o", markerfacecolor="none"), "slow step"),
+                                       (log["escapes"] > 0, dict(color="red", marker="x"), "saddle escape"),
+                                       (log["converged"] == 0, dict(color="black", marker="^", markerfacecolor="none"), "not converged")):
+                if mask.any():
+                    self.fig_ax.plot(log["H"][mask], 1e3 * log["M"][mask], linestyle="none", markersize=2*msize+4, label=label, **style)
+
         if (sim_len, exp_len) == (0, 0):
             self.fig_ax.set_xlim((0, 1))
             self.fig_ax.set_ylim((0, 1))
@@ -495,7 +566,7 @@ class GUI(ctk.CTk):
         self.fig_ax.set_ylim(-200, 200)
         self.fig_ax.set_xlabel("µ{0}H (T)".format(chr(0x2080)), fontsize=15*GUI_scale)
         if len(self.exp_H) > 0:
-            x_max = max(self.exp_H) * 1.1
+            x_max = np.max(self.exp_H) * 1.1
             self.fig_ax.set_xlim(-x_max, x_max)
         elif len(self.sim_H) > 0:
             x_max = max(self.sim_H) * 1.1
@@ -521,8 +592,9 @@ class GUI(ctk.CTk):
 
 
     def drawEnergyPlot(self):
-        self.cur_plot = "energy"
         self.updateParamValues()
+        if self.getEnergyLandscape() is None: return    # starts precomputing the landscapes of all fields
+        self.cur_plot = "energy"
         if len(self.phiA[0]) > 0:
             steps = len(self.phiA[0])
         else:
@@ -556,6 +628,11 @@ class GUI(ctk.CTk):
         if len(self.sim_H) == 0 or self.sim_H[i] == self.EnergyFieldValue:
             self.fig.canvas.draw()
             return
+        # the landscapes of all fields are precomputed on a background thread, so this is usually just a lookup
+        landscape = self.getEnergyLandscape()
+        if landscape is None:
+            self.fig.canvas.draw()
+            return
         self.EnergyFieldValue = round(self.sim_H[i] * 1e3, 2)   # mT
         self.EnergyFieldEntry.configure(state="normal")
         self.EnergyFieldEntry.delete(0, "end")
@@ -563,16 +640,11 @@ class GUI(ctk.CTk):
         self.EnergyFieldEntry.configure(state="disabled")
         title = "Energy Landscape for phiH=" + str(round(self.param_values[8][0]*180/np.pi, 1)) + "° at " + str(self.EnergyFieldValue) + " mT"
         self.fig_ax.set_title(title, fontsize=16*GUI_scale)
-        
-        g_calc = MacrospinModel(gui=root, sim_H=[], param_values=self.param_values)
-        g = []
-        phi = np.linspace(-np.pi, np.pi, num=120)
-        for phi_k in phi:
-            gi, dg = g_calc.get_G(phis=(phi_k, phi), h=1e-3*self.EnergyFieldValue)
-            g.append(gi)
-
-        x, y = np.meshgrid(np.arange(-180, 180, 3), np.arange(-180, 180, 3))
-        g_min = np.array(g).min()
+
+        g = landscape.get(i)
+
+        x, y = np.meshgrid(landscape.phi_deg, landscape.phi_deg)
+        g_min = g.min()
         self.g_plot = self.fig_ax.pcolormesh(x, y, g, cmap='RdBu', vmin=g_min, vmax=g_min/1.5)
         divider = make_axes_locatable(self.fig_ax)
         cax = divider.append_axes("right", size="5%", pad=0.3)
@@ -586,6 +658,27 @@ class GUI(ctk.CTk):
         self.fig.canvas.draw()
 
 
+    def getEnergyLandscape(self):
+        # the landscape stack is only rebuilt if the parameters, the field values or the grid changed
+        # returns None if the parameters or the field angle can't be read
+        if None in self.param_values[:8] or not self.param_values[8]:
+            self.writeConsole("Error: The energy landscape needs valid values of all parameters and phiH.")
+            return None
+        n_phi = int(round(360 / float(self.EnergyGridBox.get().rstrip("°"))))
+        settings = (tuple(self.param_values[:8]), self.param_values[8][0], tuple(self.sim_H), n_phi)
+        if self.energy_landscape is None or self.energy_landscape_settings != settings:
+            if self.energy_landscape is not None: self.energy_landscape.stop()
+            self.energy_landscape = EnergyLandscape(self.param_values, self.sim_H, n_phi=n_phi)
+            self.energy_landscape.start()
+            self.energy_landscape_settings = settings
+        return self.energy_landscape
+
+
+    def changeEnergyGrid(self, value):
+        self.EnergyFieldValue = None    # forces a redraw at the same field value
+        self.calcEnergyLandscape(self.EnergyFieldSlider.get())
+
+
     def slider_decrease(self):
         new_Slider_value = int(self.EnergyFieldSlider.get()) + 1
         self.EnergyFieldSlider.set(new_Slider_value)
@@ -612,50 +705,11 @@ class GUI(ctk.CTk):
         exp_data_filename = tk.filedialog.askopenfilename(parent=self, initialdir=os.getcwd())
         if exp_data_filename == "": return
         try:
-            exp_H, exp_M = np.loadtxt(exp_data_filename, dtype=np.float64, usecols=(0,1), unpack=True, skiprows=2)
-            with open(exp_data_filename, "r") as f:
-                lines = f.readlines()
-                if " " not in lines[1]:
-                    units = lines[1].split("\t")
-                else:
-                    units = lines[1].split(" ")
-                    units = [unit.replace("\n", "") for unit in units]
-
-            units = [x for x in units if x != ""]   # remove all "" entries from units
-            exp_H_unit = units[0]
-            exp_M_unit = units[1]
-
-            # want exp_H in T
-            if "Oe" in exp_H_unit:
-                exp_H = [x/1e4 for x in exp_H]
-            elif "mT" in exp_H_unit:
-                exp_H = [x/1e3 for x in exp_H]
-            elif "T" not in exp_H_unit:
-                self.writeConsole("Magnetic field values H of loaded data are neither in units of Oe, mT nor T. Loading data aborted.")
-                return
-            
-            # want exp_M in A unit (d*M)
-            if "kA/m" in exp_M_unit:
-                exp_M = [1e3 * m * self.d_tot_nom_val for m in exp_M]
-                exp_M_unit = "A"
-            elif "A/m" in exp_M_unit:
-                exp_M = [m * self.d_tot_nom_val for m in exp_M]
-                exp_M_unit = "A"
-            else:
-                self.writeConsole("Magnetization values M of loaded data are neither in units of kA/m nor A/m. Loading data aborted.")
-                return
-            exp_M_plot = [1e3 * m for m in exp_M] # plot d*M in mA units
-
-            # I want a list of the H step density for FOM weighting later on
-            exp_H_steps = []
-            for i in range(len(exp_H)):
-                if i == 0:
-                    dH = 2 * np.abs(exp_H[i] - exp_H[i+1])
-                elif i == len(exp_H)-1:
-                    dH = 2 * np.abs(exp_H[i-1] - exp_H[i])
-                else:
-                    dH = np.abs(exp_H[i-1] - exp_H[i]) + np.abs(exp_H[i] - exp_H[i+1])
-                exp_H_steps.append(dH)
+            exp_H, exp_M, exp_H_steps = DataIO.loadExpData(exp_data_filename, self.d_tot_nom_val)
+            exp_M_plot = 1e3 * exp_M    # plot d*M in mA units
+        except DataIO.UnitError as err:
+            self.writeConsole(str(err))
+            return
         except Exception as err:
             self.writeConsole("Error: Exp. data could not be loaded. Make sure you chose the correct file and it is structured correctly (see documentation).")      
         else:
@@ -663,22 +717,28 @@ class GUI(ctk.CTk):
             self.exp_H_steps = exp_H_steps
             self.exp_M.append(exp_M)
             self.exp_M_plot.append(exp_M_plot)
+            self.fom = None     # the FOM has to be rebuilt for the new data
             filename = exp_data_filename.split("/")
             filename = filename[-1]
             self.loaded_filenames.append(filename)
-            txt = "Loaded data files: "
-            for i in range(len(self.loaded_filenames)):
-                txt += "exp #" + str(i+1) + ": " + str(self.loaded_filenames[i]) + ", "
-            txt = txt[:-2]
-            self.loaded_file_label.configure(text=txt)
+            self.updateLoadedFilesLabel()
             self.drawPlot("Hysteresis", rescale=True)
 
 
+    def updateLoadedFilesLabel(self):
+        txt = "Loaded data files: "
+        for i in range(len(self.loaded_filenames)):
+            txt += "exp #" + str(i+1) + ": " + str(self.loaded_filenames[i]) + ", "
+        txt = txt[:-2]
+        self.loaded_file_label.configure(text=txt)
+
+
     def removeData(self):
         self.exp_H = []
         self.exp_M = []
         self.exp_M_plot = []
         self.exp_H_steps = []
+        self.fom = None
         self.loaded_filenames = []
         self.loaded_file_label.configure(text="Loaded data file: ")
         try:
@@ -692,33 +752,19 @@ class GUI(ctk.CTk):
     def removeSim(self):
         self.EnergyFieldSlider.set(0)
         self.sim_H, self.sim_M, self.sim_M_plot, self.phiA, self.phiB = [], [], [], [], []
+        self.solver_log = None
         self.drawPlot("Hysteresis", rescale=False)
 
             
     def updateSimH(self):
-        if len(self.exp_H) == 0 or self.use_sim_field.get() == "on":
-            try:
+        try:
+            max_H, H_steps = None, None
+            if len(self.exp_H) == 0 or self.use_sim_field.get() == "on":
                 max_H = float(self.sim_H_max.get()) / 1e3
                 H_steps = float(self.sim_dH.get()) / 1e3
-                nmr_of_steps = int(2*max_H/H_steps)
-                if self.full_hyst_check.get() == "off":
-                    self.sim_H = list(np.linspace(max_H, -max_H, nmr_of_steps))
-                    self.sim_H_plot = list(np.append(self.sim_H, self.sim_H[::-1][1:]))
-                elif self.full_hyst_check.get() == "on":
-                    sim_H_down_sweep = np.linspace(max_H, -max_H, nmr_of_steps)
-                    self.sim_H = list(np.append(sim_H_down_sweep, sim_H_down_sweep[::-1][1:]))
-                    self.sim_H_plot = list(self.sim_H)
-            except Exception as err:
-                self.writeConsole("Error within 'updateSimH': " + str(err))
-                pass
-        elif len(self.exp_H) > 0 and self.full_hyst_check.get() == "off":
-            i = np.where(self.exp_H == min(self.exp_H)) if isinstance(self.exp_H, np.ndarray) else self.exp_H.index(min(self.exp_H))
-            self.sim_H = self.exp_H[:i+1] if isinstance(i, int) else self.exp_H[:min(i[0])+1]
-            up_sweep = self.exp_H[i+1:] if isinstance(i, int) else self.exp_H[min(i[0])+1:]
-            self.sim_H_plot = list(np.append(np.asarray(self.sim_H), np.asarray(up_sweep)))
-        else:
-            self.sim_H = self.exp_H
-            self.sim_H_plot = self.exp_H
+            self.sim_H, self.sim_H_plot = DataIO.buildSimH(self.exp_H, max_H, H_steps, full_hyst=self.full_hyst_check.get(), use_sim_field=self.use_sim_field.get())
+        except Exception as err:
+            self.writeConsole("Error within 'updateSimH': " + str(err))
 
 
     def updateParamValues(self):
@@ -737,7 +783,7 @@ class GUI(ctk.CTk):
             f_id = self.dMs_linked["follower"]
             value_diff = self.exp_dMs - self.param_list[m_id].getValue()
             self.param_list[f_id].param_value.configure(state="normal")
-            self.param_list[f_id].setValue(value_diff)
+            self.param_list[f_id].setValue(value_diff, exact=True)
             self.param_list[f_id].param_value.configure(state="disabled")
 
         for i, param in enumerate(self.param_list):
@@ -798,46 +844,93 @@ class GUI(ctk.CTk):
             self.FOM_label.configure(text="-------")
             return
         # calculates the Figure of Merit (FOM) of the Simulations / Fits
+        return self.getFigureOfMerit()(sim_M)
+
+
+    def locateRegionBoundaries(self):
+        # fills H_AFM-C with the spin-flop and H_C-FM with the saturation field of the current parameters (see MacrospinModel.locateSwitchingFields)
+        self.updateParamValues()
+        if None in self.param_values or (self.param_values[3] == 0 and self.param_values[4] == 0): return
+        self.updateSimH()
+        H1, H2 = MacrospinModel(observer=GUIObserver(self), sim_H=self.sim_H, param_values=self.param_values).getRegionBoundaries()
+        if np.isnan(H1):
+            self.writeConsole("No spin-flop found, so there is no AFM region.")
+            H1 = 0
+        if np.isnan(H2):
+            self.writeConsole("The simulation doesn't saturate up to the max. field, H_C-FM is not changed.")
+        else:
+            self.C_FM_H.delete(0, "end")
+            self.C_FM_H.insert(0, round(H2 * 1e3, 3))
+        self.AFM_C_H.delete(0, "end")
+        self.AFM_C_H.insert(0, round(H1 * 1e3, 3))
+
+
+    def getFigureOfMerit(self):
+        # the FOM object is only rebuilt if the loaded data, H1/H2 or the fit focus changed
         try:
             # try/except to check if H1 and H2 is given
             H1 = float(self.AFM_C_H.get()) / 1e3    # T
             H2 = float(self.C_FM_H.get()) / 1e3     # T
-            FM, C, AFM = [], [], []
-            for i, h in enumerate(self.exp_H):
-                if H2 <= np.abs(h):
-                    # Ferromagnetic (FM) region
-                    FM.append(i)
-                elif H1 < np.abs(h) < H2:
-                    # Canted (C) region
-                    C.append(i)
-                elif np.abs(h) <= H1:
-                    # Antiferromagnetic (AFM) region
-                    AFM.append(i)
-            
-            max_H_steps = max(self.exp_H_steps)
-            FM_M_dif, C_M_dif, AFM_M_dif = [], [], []
-            for j in range(len(self.exp_M)):
-                FM_M_dif.append([np.abs((self.exp_H_steps[i]/max_H_steps) * (1 - sim_M[j][i]/self.exp_M[j][i])) for i in FM])
-                C_M_dif.append([np.abs((self.exp_H_steps[i]/max_H_steps) * (1 - sim_M[j][i]/self.exp_M[j][i])) for i in C])
-                AFM_M_dif.append([np.abs((self.exp_H_steps[i]/max_H_steps) * (1 - sim_M[j][i]/self.exp_M[j][i])) for i in AFM])
-
-            # flatten lists
-            FM_M_dif = [x for xs in FM_M_dif for x in xs]
-            C_M_dif = [x for xs in C_M_dif for x in xs]
-            AFM_M_dif = [x for xs in AFM_M_dif for x in xs]
-
-            # if we want to focus on a region, we just put some weight on their FOM
-            if self.fit_focus.get() == "FM": FM_M_dif *= 3
-            if self.fit_focus.get() == "C": C_M_dif *= 3
-            if self.fit_focus.get() == "AFM": AFM_M_dif *= 3
-
-            FOM = (sum(FM_M_dif) + sum(C_M_dif) + sum(AFM_M_dif))/(len(self.exp_H) * len(self.exp_M))
         except:
-            FOM = 0
-            for j in range(len(self.exp_M)):
-                M_dif = [(self.exp_H_steps[i]/max(self.exp_H_steps)) * np.abs(1 - sim_M[j][i]/self.exp_M[j][i]) for i in range(len(self.exp_M[j]))]
-                FOM += sum(M_dif)/len(self.exp_H)
-        return FOM
+            H1, H2 = None, None
+        settings = (len(self.exp_M), H1, H2, self.fit_focus.get())
+        if self.fom is None or self.fom_settings != settings:
+            self.fom = FigureOfMerit(self.exp_M, self.exp_H, self.exp_H_steps, H1=H1, H2=H2, fit_focus=self.fit_focus.get())
+            self.fom_settings = settings
+        return self.fom
+
+
+    def writeEscapeStats(self, model):
+        # saddle points / maxima which the minimizer had to escape from are the most expensive field steps, so we report them
+        stats = model.escape_stats
+        if stats["escapes"] > 0:
+            self.writeConsole("Saddle escapes: " + str(stats["escapes"]) + " (" + str(stats["evaluations"]) + " energy evaluations, " 
+                              + str(stats["iterations"]) + " minimizer iterations)")
+        warm = model.warm_stats
+        if warm["warm_steps"] > 0:
+            self.writeConsole("Warm-started field steps: " + str(warm["warm_steps"]) + " (" + str(warm["fallbacks"]) + " solved sequentially)")
+
+
+    def writeSolverLog(self):
+        # summary of the recorded field steps, the steps themselves are marked in the hysteresis plot and exported with the plot data
+        if self.solver_log is None or len(self.solver_log["H"]) == 0: return
+        log = self.solver_log
+        i = int(np.argmax(log["time"]))
+        self.writeConsole("Solver log: " + str(len(log["H"])) + " field steps in " + str(round(log["time"].sum(), 1)) + " ms, " 
+                          + str(int(log["iterations"].sum())) + " iterations, " + str(int(log["evaluations"].sum())) + " energy evaluations, "
+                          + str(int((log["converged"] == 0).sum())) + " not converged")
+        self.writeConsole("Slowest field step: " + str(round(log["time"][i], 2)) + " ms at H = " + str(round(log["H"][i], 4)) + " T (phiH = " 
+                          + str(round(log["phiH"][i], 1)) + "°)")
+
+
+    def getWorkers(self):
+        # number of processes for parallel simulations / fits, falls back to 1 if the entry is no positive integer
+        try:
+            return max(int(self.n_workers.get()), 1)
+        except:
+            return 1
+
+
+    def showBestFit(self, FOM, fitted_paras, sim_M):
+        # plots the new best fit and writes its parameters into the GUI and console
+        self.fit_history.append([self.fit_number, float(FOM)] + [np.nan if value is None else value for value in 
+                                                                 [fitted_paras.get(i, self.param_values[i]) for i in range(8)]])
+        self.sim_M = sim_M
+        self.sim_M_plot = []
+        for i in range(len(sim_M)):
+            self.sim_M_plot.append([m * 1e3 for m in sim_M[i]])
+        self.drawPlot("Hysteresis", rescale=False)
+
+        self.writeConsole("------------------------------------------------")
+        for i, value in fitted_paras.items():
+            if i in (2, 7):
+                value *= (180/np.pi) # phiani from pi values to deg
+            else:   
+                value *= 1e3    # d*Ms from A to mA, Hani from T to mT and J/m^2 to mJ/m^2
+            self.param_list[i].setValue(value, exact=True)
+            self.writeConsole(self.param_list[i].param_name + " = " + str(value) + " " + self.param_list[i].unit)
+        self.FOM_label.configure(text=str(FOM.round(8)))
+        self.writeConsole("New FOM: " + str(FOM.round(8)))
 
 
     def stopDaemon(self):
@@ -865,14 +958,18 @@ class GUI(ctk.CTk):
             return
         
         self.updateSimH()
-        MH_sim = MacrospinModel(gui=root, sim_H=self.sim_H, exp_H=self.exp_H, param_values=self.param_values, 
-                                use_sim_field=self.use_sim_field.get(), full_hyst=self.full_hyst_check.get())
+        MH_sim = MacrospinModel(observer=GUIObserver(self), sim_H=self.sim_H, exp_H=self.exp_H, param_values=self.param_values, 
+                                use_sim_field=self.use_sim_field.get(), full_hyst=self.full_hyst_check.get(), workers=self.getWorkers(), cache=self.sim_cache,
+                                adaptive_step=self.adaptive_step.get(), instrument=self.solver_log_check.get())
         if self.use_sim_field.get() == "on" and len(self.exp_H) > 0:
             self.sim_M, sim_M_FOM, self.phiA, self.phiB = MH_sim.calculateMH()   # simulate M(H)
             self.updateFOM(sim_M_FOM)
         else:
             self.sim_M, self.phiA, self.phiB = MH_sim.calculateMH()   # simulate M(H)
             self.updateFOM()            
+        self.writeEscapeStats(MH_sim)
+        self.solver_log = MH_sim.solver_log
+        self.writeSolverLog()
 
         self.sim_M_plot = []
         for i in range(len(self.sim_M)):
@@ -917,10 +1014,12 @@ class GUI(ctk.CTk):
         self.FM1_dMs_calc.disableButton()
         self.FM2_dMs_calc.disableButton()
 
+        self.fit_number += 1
         self.updateSimH()
-        MH_fit = MacrospinModel(gui=root, sim_H=self.sim_H, param_values=self.param_values, exp_H=self.exp_H, fit_paras=fit_paras, 
+        MH_fit = MacrospinModel(observer=GUIObserver(self), sim_H=self.sim_H, param_values=self.param_values, exp_H=self.exp_H, fit_paras=fit_paras, 
                                 fit_para_ind=fit_para_ind, fit_type=self.fit_prec.get(), bnds=bnds, full_hyst=self.full_hyst_check.get(),
-                                use_sim_field=self.use_sim_field.get())
+                                use_sim_field=self.use_sim_field.get(), workers=self.getWorkers(), fom=self.getFigureOfMerit(), cache=self.sim_cache,
+                                adaptive_step=self.adaptive_step.get(), ensemble=self.ensemble_fit.get(), warm_start=self.warm_start_check.get())
         
         # if both d*Ms parameters are linked to each other AND we want to fit one of them, we need to update the other one accordingly during the fitting process
         # please ignore the ugly hard coding :)
@@ -930,6 +1029,8 @@ class GUI(ctk.CTk):
             MH_fit.addLinkedParas(sum=self.exp_dMs*1e-3, master=m_id, follower=f_id)
 
         fitted_paras = MH_fit.fit()    # fit M(H) to exp data
+        self.writeConsole("Simulation cache: " + str(self.sim_cache.hits) + " hits, " + str(self.sim_cache.misses) + " misses")
+        self.writeEscapeStats(MH_fit)
         if len(fitted_paras) == 0:
             for button in self.disable_buttons:
                 button.configure(state="normal")
@@ -943,147 +1044,232 @@ class GUI(ctk.CTk):
                 fitted_paras[0] *= (180/np.pi) # phiani from pi values to deg
             else:   
                 fitted_paras[0] *= 1e3    # d*Ms from A to mA, Hani from T to mT and J/m^2 to mJ/m^2
-            self.param_list[i].setValue(fitted_paras[0])
+            self.param_list[i].setValue(fitted_paras[0], exact=True)
             fitted_paras.pop(0)
 
         self.MHsim()
 
 
     def exportPlotData(self):
+        # the columns of the current plot are written by DataIO as tab separated .txt, .csv or binary .npz (chosen by the file extension)
         self.updateParamValues()
         try:
             if self.cur_plot == "M(H)" and len(self.sim_M) != 0:
-                sim_M_tot = [self.sim_H_plot]
+                phiHs = [str(round(self.param_values[8][i]*180/np.pi, 0)) for i in range(len(self.sim_M))]
                 if self.d_tot_nom_val != 0:
-                    sim_M_unit = "kA/m"
-                    for i in range(len(self.sim_M)):
-                        sim_M = 1e-3 * np.asarray(self.sim_M[i], dtype=np.float64) / self.d_tot_nom_val # sim_M in kA/m
-                        sim_M_tot.append(sim_M)
-                elif self.d_tot_nom_val == 0:
-                    sim_M_unit = "mA"
-                    for i in range(len(self.sim_M)):
-                        sim_M = 1e3 * np.asarray(self.sim_M[i], dtype=np.float64) # sim_M in mA
-                        sim_M_tot.append(sim_M)
-                sim_data = list(map(list, zip(*sim_M_tot)))
-                save_data = "H\t"
-                units = "[T]\t"
-                for i in range(len(self.sim_M)):
-                    phiH = str(round(self.param_values[8][i]*180/np.pi, 0))
-                    save_data += "M_(phiH={pH}°)\t".format(pH = phiH)
-                    units += "[" + sim_M_unit + "]\t"
-                save_data = save_data[:-1] + "\n"
-                units = units[:-1] + "\n"
-                save_data += units
-                for i, line in enumerate(sim_data):
-                    for j in range(len(line)):
-                        save_data += str(line[j]) + "\t"
-                    save_data = save_data[:-1] + "\n"
-                save_data = save_data[:-1]
+                    M_unit, M_columns = "[kA/m]", [1e-3 * np.asarray(sim_M, dtype=np.float64) / self.d_tot_nom_val for sim_M in self.sim_M]  # sim_M in kA/m
+                else:
+                    M_unit, M_columns = "[mA]", [1e3 * np.asarray(sim_M, dtype=np.float64) for sim_M in self.sim_M]   # sim_M in mA
+                names = ["H"] + ["M_(phiH={pH}°)".format(pH=phiH) for phiH in phiHs]
+                units = ["[T]"] + [M_unit] * len(M_columns)
+                columns = [self.sim_H_plot] + M_columns
             elif self.cur_plot == "macrospins" and len(self.phiA) != 0:
-                sim_data = [self.sim_H]
-                phiA_local = self.phiA.copy()
-                phiB_local = self.phiB.copy()
-                for j in range(len(self.phiA)):
-                    for i in range(len(self.phiA[j])):
-                        phiA_local[j].append(normalizeRadian(phiA_local[j][i]*np.pi/180 + np.pi)*180/np.pi)
-                        phiB_local[j].append(normalizeRadian(phiB_local[j][i]*np.pi/180 + np.pi)*180/np.pi)
-                    sim_data.append(phiA_local[j])
-                    sim_data.append(phiB_local[j])
-                sim_data = list(map(list, zip(*sim_data)))
-                save_data = "H\t"
-                units = "[T]\t"
-                for i in range(len(self.phiA)):
-                    phiH = str(round(self.param_values[8][i]*180/np.pi, 0))
-                    save_data += "phi_top_(phiH={pH}°)\tphi_bot_(phiH={pH}°)\t".format(pH = phiH)
-                    units += "[deg]\t[deg]\t"
-                save_data = save_data[:-1] + "\n"
-                units = units[:-1] + "\n"
-                save_data += units
-                for i, line in enumerate(sim_data):
-                    for j in range(len(line)):
-                        save_data += str(line[j]) + "\t"
-                    save_data = save_data[:-1] + "\n"
-                save_data = save_data[:-1]
-            elif self.cur_plot == "energy":
-                self.writeConsole("Exporting the energy landscape is currently not supported.")
-                return
+                phiHs = [str(round(self.param_values[8][i]*180/np.pi, 0)) for i in range(len(self.phiA))]
+                phiA = np.asarray(self.phiA, dtype=np.float64)
+                phiB = np.asarray(self.phiB, dtype=np.float64)
+                H = np.asarray(self.sim_H, dtype=np.float64)[:phiA.shape[1]]
+                if len(self.sim_H_plot) > len(self.sim_H):
+                    # only the down sweep was simulated, the up sweep at -H has the angles of the down sweep at H rotated by 180°
+                    phiA_up = normalizeRadianArray(phiA*np.pi/180 + np.pi)
+                    phiB_up = normalizeRadianArray(phiB*np.pi/180 + np.pi)
+                    if self.use_sim_field.get() == "off" and len(self.exp_H) > 0:
+                        # the up sweep is plotted at the exp. field values, so the angles are interpolated onto them like M in mirrorSweep
+                        # (unwrapped, so a jump across ±180° isn't interpolated through 0°)
+                        H_up = np.asarray(self.sim_H_plot[len(self.sim_H):], dtype=np.float64)
+                        phiA_up = np.array([np.interp(H_up, -H, np.unwrap(phi)) for phi in phiA_up])
+                        phiB_up = np.array([np.interp(H_up, -H, np.unwrap(phi)) for phi in phiB_up])
+                    else:
+                        H_up, phiA_up, phiB_up = -H[1:], phiA_up[:, 1:], phiB_up[:, 1:]
+                    H = np.append(H, H_up)
+                    phiA = np.append(phiA, normalizeRadianArray(phiA_up)*180/np.pi, axis=1)
+                    phiB = np.append(phiB, normalizeRadianArray(phiB_up)*180/np.pi, axis=1)
+                names, columns = ["H"], [H]
+                for i, phiH in enumerate(phiHs):
+                    names += ["phi_top_(phiH={pH}°)".format(pH=phiH), "phi_bot_(phiH={pH}°)".format(pH=phiH)]
+                    columns += [phiA[i], phiB[i]]
+                units = ["[T]"] + ["[deg]"] * (len(names) - 1)
+            elif self.cur_plot == "energy" and len(self.sim_H) != 0:
+                landscape = self.getEnergyLandscape()
+                if landscape is None: return
             else:
                 return
         except Exception as err:
             self.writeConsole("Error while trying to export plot: " + str(err))
             return
-        save_filename = tk.filedialog.asksaveasfilename(parent=self, initialdir=os.getcwd(), filetypes=[("Text File", ".txt")], defaultextension=".txt")
-        if save_filename != "":
-            with open(save_filename, "w") as f:
-                f.write(save_data)
+        save_filename = tk.filedialog.asksaveasfilename(parent=self, initialdir=os.getcwd(), defaultextension=".txt",
+                                                        filetypes=[("Text File", ".txt"), ("CSV File", ".csv"), ("NumPy Binary", ".npz")])
+        if save_filename == "": return
+        table_format = DataIO.tableFormat(save_filename)
+        try:
+            if self.cur_plot == "energy":
+                # the whole stack of landscapes at all field values (only the first phiH, like the plot)
+                DataIO.writeLandscapeStack(save_filename, landscape.sim_H, landscape.phi_deg, landscape.getStack(), format=table_format)
+            else:
+                DataIO.writeTable(save_filename, names, units, columns, format=table_format)
+        except Exception as err:
+            self.writeConsole("Error while trying to export plot: " + str(err))
+            return
+        if self.cur_plot == "M(H)" and self.solver_log is not None:
+            # the recorded field steps are saved next to the M(H) data
+            base, extension = os.path.splitext(save_filename)
+            log_filename = base + "_solver_log" + extension
+            DataIO.writeTable(log_filename, SOLVER_LOG_NAMES, SOLVER_LOG_UNITS, [self.solver_log[name] for name in SOLVER_LOG_NAMES], format=table_format)
+            self.writeConsole("Solver log saved to " + log_filename)
 
 
     def exportParameters(self):
-        param_names = ["Ms_A * d_A", "Ms_A", "d_A", "Hani_A", "phiAni_A", "J1", "J2", "Ms_B * d_B", "Ms_B", "d_B", "Hani_B", "phiAni_B", "phiH", "H_afm-c", "H_c-fm", "Ms_tot", "d_tot"]
-        units = ["[mA]", "[kA/m]", "[nm]", "[mT]", "[deg]", "[mJ/m^2]", "[mJ/m^2]", "[mA]", "[kA/m]", "[nm]", "[mT]", "[deg]", "[deg]", "[mT]", "[mT]", "[kA/m]", "[nm]"]
         self.updateParamValues()
-        param_values = []
-        for i in range(0, 9):
-            if i in (0, 1, 3, 4, 5, 6):
-                val = round(self.param_values[i] * 1e3, 13)
-            elif i in (2, 7):
-                val = round(self.param_values[i] * 180/np.pi, 3)
-            elif i == 8:
-                phiHs = [str(round(float(phiH)*180/np.pi, 1)) for phiH in self.param_values[i]]
-                val = ", ".join(phiHs)
-            else:
-                val = self.param_values[i]
-            param_values.append(str(val))
+        param_values = self.getParameterFileValues()
+        save_filename = tk.filedialog.asksaveasfilename(parent=self, initialdir=os.getcwd(), filetypes=[("Text File", ".txt")], defaultextension=".txt")
+        if save_filename != "": DataIO.writeParameterFile(save_filename, param_values)
+
 
+    def getParameterFileValues(self):
+        # the 17 values of a parameter file (see DataIO.PARAM_NAMES) as shown in the GUI
         Ms_A = self.FM2_dMs_calc.getMs()
         if Ms_A == "": Ms_A = "unknown"
-        param_values.insert(1, Ms_A)
         d_A = self.FM2_dMs_calc.getd()
         if d_A == "": d_A = "unknown"
-        param_values.insert(2, d_A)
         Ms_B = self.FM1_dMs_calc.getMs()
         if Ms_B == "": Ms_B = "unknown"
-        param_values.insert(8, Ms_B)
         d_B = self.FM1_dMs_calc.getd()
         if d_B == "": d_B = "unknown"
-        param_values.insert(9, d_B)
-        param_values.append(self.AFM_C_H.get())
-        param_values.append(self.C_FM_H.get())
-        param_values.append(self.Ms_tot_nom_val * 1e-3)
-        param_values.append(self.d_tot_nom_val * 1e9)
-        param_values_table = np.stack((param_names, units, param_values), dtype=str)
-        save_filename = tk.filedialog.asksaveasfilename(parent=self, initialdir=os.getcwd(), filetypes=[("Text File", ".txt")], defaultextension=".txt")
-        if save_filename != "": np.savetxt(save_filename, param_values_table, fmt='%s', delimiter="\t")
+        return DataIO.parameterFileValues(self.param_values, Ms_A=Ms_A, d_A=d_A, Ms_B=Ms_B, d_B=d_B, H1=self.AFM_C_H.get(), H2=self.C_FM_H.get(),
+                                          Ms_tot=self.Ms_tot_nom_val * 1e-3, d_tot=self.d_tot_nom_val * 1e9)
 
 
     def loadParameters(self):
         openFilename = tk.filedialog.askopenfilename(parent=self, initialdir=os.getcwd())
         if openFilename == "": return
         try:
-            with open(openFilename, "r") as f:
-                lines = f.readlines()
-                new_params = lines[2].split("\t")
-                for i in range(len(new_params)):
-                    if "\n" in new_params[i]:
-                        new_params[i] = new_params[i].replace("\n", "")
-                    if i == 0: self.param_list[0].setValue(float(new_params[i]))
-                    elif i == 1: self.FM2_dMs_calc.setMs(new_params[i])
-                    elif i == 2: self.FM2_dMs_calc.setd(new_params[i])
-                    elif i in (3, 4, 5, 6, 7): self.param_list[i-2].setValue(float(new_params[i]))     # hani_A, phiani_A, J1, J2 and d_B * Ms_B
-                    elif i == 8: self.FM1_dMs_calc.setMs(new_params[i])
-                    elif i == 9: self.FM1_dMs_calc.setd(new_params[i])
-                    elif i in (10, 11): self.param_list[i-4].setValue(float(new_params[i]))     # hani_B, phiani_B
-                    elif i in (12, 13, 14, 15, 16):
-                        entry_list = [self.sim_phiH, self.AFM_C_H, self.C_FM_H, self.Ms_tot_nom, self.d_tot_nom]
-                        entry_field = entry_list[i-12]
-                        entry_field.delete(0, "end")
-                        entry_field.insert(0, new_params[i])
-                self.updateParamValues()
+            self.setParameterFileValues(DataIO.readParameterFile(openFilename))
         except:
             self.writeConsole("Error: Parameter file could not be loaded. Make sure you chose the correct file.")
 
 
+    def setParameterFileValues(self, new_params):
+        # inverse of getParameterFileValues
+        for i in range(len(new_params)):
+            if i == 0: self.param_list[0].setValue(float(new_params[i]), exact=True)
+            elif i == 1: self.FM2_dMs_calc.setMs(new_params[i])
+            elif i == 2: self.FM2_dMs_calc.setd(new_params[i])
+            elif i in (3, 4, 5, 6, 7): self.param_list[i-2].setValue(float(new_params[i]), exact=True)     # hani_A, phiani_A, J1, J2 and d_B * Ms_B
+            elif i == 8: self.FM1_dMs_calc.setMs(new_params[i])
+            elif i == 9: self.FM1_dMs_calc.setd(new_params[i])
+            elif i in (10, 11): self.param_list[i-4].setValue(float(new_params[i]), exact=True)     # hani_B, phiani_B
+            elif i in (12, 13, 14, 15, 16):
+                entry_list = [self.sim_phiH, self.AFM_C_H, self.C_FM_H, self.Ms_tot_nom, self.d_tot_nom]
+                entry_field = entry_list[i-12]
+                entry_field.delete(0, "end")
+                entry_field.insert(0, new_params[i])
+        self.updateParamValues()
+
+
+    def saveProject(self):
+        # saves the whole session (exp. data, parameters, bounds, options, simulation and fit history) into one binary file
+        self.updateParamValues()
+        save_filename = tk.filedialog.asksaveasfilename(parent=self, initialdir=os.getcwd(), filetypes=[("MagSAF Project", ".npz")], defaultextension=".npz")
+        if save_filename == "": return
+        if os.path.abspath(save_filename) == self.project_filename: self.copyProjectArrays()
+        try:
+            parameters = [param for param in self.param_list if type(param) == Parameter]
+            settings = {"parameters": self.getParameterFileValues(),
+                        "lower_bounds": [param.param_lower.get() for param in parameters],
+                        "upper_bounds": [param.param_upper.get() for param in parameters],
+                        "fit": [param.getFitCheckbox() for param in parameters],
+                        "dMs_linked": self.dMs_linked,
+                        "entries": {name: entry.get() for name, entry in self.getProjectEntries().items()},
+                        "checkboxes": {name: checkbox.get() for name, checkbox in self.getProjectCheckboxes().items()},
+                        "fit_focus": self.fit_focus.get(), "fit_prec": self.fit_prec.get(),
+                        "loaded_filenames": self.loaded_filenames,
+                        "fit_history_names": FIT_HISTORY_NAMES}
+            arrays = {"param_values": [np.nan if value is None else value for value in self.param_values[:8]],
+                      "lower_bounds": self.param_l_bnds, "upper_bounds": self.param_u_bnds, "phiH": self.param_values[8] or [],
+                      "exp_H": self.exp_H, "exp_H_steps": self.exp_H_steps, "exp_M": self.exp_M,
+                      "sim_H": self.sim_H, "sim_H_plot": self.sim_H_plot, "sim_M": self.sim_M, "phiA": self.phiA, "phiB": self.phiB,
+                      "fit_history": np.reshape(self.fit_history, (-1, len(FIT_HISTORY_NAMES)))}
+            if self.solver_log is not None:
+                arrays.update({"solver_log_" + name: self.solver_log[name] for name in SOLVER_LOG_NAMES})
+            DataIO.saveProject(save_filename, arrays, settings)
+        except Exception as err:
+            self.writeConsole("Error: The project could not be saved: " + str(err))
+            return
+        self.project_filename = os.path.abspath(save_filename)
+        self.writeConsole("Project saved to " + save_filename)
+
+
+    def openProject(self):
+        # restores a session saved by saveProject, the large arrays stay memory mapped in the project file until they are replaced
+        openFilename = tk.filedialog.askopenfilename(parent=self, initialdir=os.getcwd(), filetypes=[("MagSAF Project", ".npz"), ("All Files", "*")])
+        if openFilename == "": return
+        try:
+            settings, arrays = DataIO.loadProject(openFilename)
+            self.removeLinks()
+            self.setParameterFileValues(settings["parameters"])
+            parameters = [param for param in self.param_list if type(param) == Parameter]
+            for i, param in enumerate(parameters):
+                param.setBounds(settings["lower_bounds"][i], settings["upper_bounds"][i])
+                param.setFitCheckbox(settings["fit"][i])
+                # the exact values, the parameter file values are rounded
+                if np.isfinite(arrays["param_values"][i]):
+                    param.setValue(arrays["param_values"][i] * (180/np.pi if i in (2, 7) else 1e3), exact=True)
+            for name, entry in self.getProjectEntries().items():
+                entry.delete(0, "end")
+                entry.insert(0, settings["entries"][name])
+            for name, checkbox in self.getProjectCheckboxes().items():
+                checkbox.select() if settings["checkboxes"][name] in ("on", True) else checkbox.deselect()
+            self.fit_focus.set(settings["fit_focus"])
+            self.fit_prec.set(settings["fit_prec"])
+            follower = settings["dMs_linked"]["follower"]
+            if follower != -1:
+                self.param_list[follower].link_checkbox.select()
+                self.updateCheckboxes(1 if follower == 0 else 9, "link")
+
+            self.exp_H, self.exp_H_steps = arrays["exp_H"], arrays["exp_H_steps"]
+            self.exp_M = list(arrays["exp_M"])
+            self.exp_M_plot = [1e3 * exp_M for exp_M in self.exp_M]
+            self.loaded_filenames = list(settings["loaded_filenames"])
+            self.sim_H, self.sim_H_plot = arrays["sim_H"], arrays["sim_H_plot"]
+            self.sim_M = list(arrays["sim_M"])
+            self.sim_M_plot = [1e3 * sim_M for sim_M in self.sim_M]
+            self.phiA, self.phiB = arrays["phiA"].tolist(), arrays["phiB"].tolist()
+            self.solver_log = {name: arrays["solver_log_" + name] for name in SOLVER_LOG_NAMES} if "solver_log_H" in arrays else None
+            self.fit_history = arrays["fit_history"].tolist()
+            self.fit_number = int(max([row[0] for row in self.fit_history], default=0))
+            self.project_filename = os.path.abspath(openFilename)
+        except Exception as err:
+            self.writeConsole("Error: Project file could not be loaded: " + str(err))
+            return
+        self.fom = None
+        self.updateParamValues()
+        self.updateLoadedFilesLabel() if len(self.loaded_filenames) > 0 else self.loaded_file_label.configure(text="Loaded data file: ")
+        self.EnergyFieldSlider.set(0)
+        self.drawPlot("Hysteresis", rescale=True)
+        self.updateFOM()
+        self.writeConsole("Project loaded from " + openFilename)
+
+
+    def copyProjectArrays(self):
+        # the memory mapped arrays keep their project file open, which then can't be replaced (on Windows), so they are copied into memory first
+        self.exp_H, self.exp_H_steps, self.sim_H, self.sim_H_plot = [np.array(values) for values in (self.exp_H, self.exp_H_steps, self.sim_H, self.sim_H_plot)]
+        self.exp_M = [np.array(exp_M) for exp_M in self.exp_M]
+        self.sim_M = [np.array(sim_M) for sim_M in self.sim_M]
+        if self.solver_log is not None: self.solver_log = {name: np.array(values) for name, values in self.solver_log.items()}
+        self.fom = None
+
+
+    def getProjectEntries(self):
+        # entries and check boxes (besides the parameters) which are saved in a project
+        return {"sim_H_max": self.sim_H_max, "sim_dH": self.sim_dH, "n_workers": self.n_workers}
+
+
+    def getProjectCheckboxes(self):
+        return {"full_hyst": self.full_hyst_check, "use_sim_field": self.use_sim_field, "adaptive_step": self.adaptive_step, 
+                "ensemble_fit": self.ensemble_fit, "solver_log": self.solver_log_check, "warm_start": self.warm_start_check}
+
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()    # needed for the process pool in the frozen .exe
     root = GUI()
     root.tk_setPalette(background="#828282", selectColor="#1F6AA5", foreground="black")
     root.protocol("WM_DELETE_WINDOW", closeApp)
@@ -0,0 +1,53 @@
+class ModelObserver():
+    '''
+    Base class for everything that follows a simulation / fit of a model.
+    The models run headless and only report through these methods, so a client (e.g. the GUI, a script or a benchmark)
+    overwrites just the ones it needs. The default observer ignores everything and never requests a stop.
+    '''
+    def setProgress(self, value):
+        # value between 0 and 1
+        pass
+
+    def setProgressLabel(self, text):
+        pass
+
+    def stopRequested(self):
+        # return True to cancel the running simulation / fit
+        return False
+
+    def writeConsole(self, text):
+        pass
+
+    def newBestFit(self, FOM, fitted_paras, sim_M):
+        # called whenever a fit finds a new best FOM
+        # fitted_paras: {index in param_values: value} of all fitted parameters (in SI units)
+        # sim_M: list of the simulated M(H) loops (in A) of all field angles
+        pass
+
+
+class CallbackObserver(ModelObserver):
+    '''
+    Observer built from plain callback functions, e.g. for scripts:
+    CallbackObserver(progress=print, best=lambda FOM, paras, M: print(FOM))
+    '''
+    def __init__(self, progress=None, label=None, stop=None, console=None, best=None):
+        self.progress = progress
+        self.label = label
+        self.stop = stop
+        self.console = console
+        self.best = best
+
+    def setProgress(self, value):
+        if self.progress is not None: self.progress(value)
+
+    def setProgressLabel(self, text):
+        if self.label is not None: self.label(text)
+
+    def stopRequested(self):
+        return self.stop is not None and bool(self.stop())
+
+    def writeConsole(self, text):
+        if self.console is not None: self.console(text)
+
+    def newBestFit(self, FOM, fitted_paras, sim_M):
+        if self.best is not None: self.best(FOM, fitted_paras, sim_M)
@@ -0,0 +1,248 @@
+import os
+import itertools
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from MacrospinModel import MacrospinModel
+from ModelObserver import ModelObserver
+import DataIO
+
+
+def getCharacteristicFields(sim_H, M, M_sat, sat_tol=0.01, jump_tol=0.05):
+    # characteristic values of one down sweep M(sim_H) from +H_max to -H_max (M in A, H in T)
+    # H_sat: field above which M stays within sat_tol of the saturation M_sat (nan if it never saturates)
+    # H_sf: field of the largest jump of M on the positive branch (spin-flop), if it is larger than jump_tol * M_sat (nan otherwise)
+    # H_c: first field at which M reaches 0 (coercive field), M_r: M at H = 0 (remanence), both relative to M_sat
+    H = np.asarray(sim_H, dtype=np.float64)
+    m = np.asarray(M, dtype=np.float64)[:len(H)] / M_sat
+    pos = H >= 0
+    H_pos, m_pos = H[pos], m[pos]
+
+    H_sat = np.nan
+    below = np.nonzero(m_pos < 1 - sat_tol)[0]
+    if len(below) == 0:
+        H_sat = H_pos[-1]
+    elif below[0] > 0:
+        i = below[0]
+        H_sat = np.interp(1 - sat_tol, [m_pos[i], m_pos[i-1]], [H_pos[i], H_pos[i-1]])
+
+    H_sf = np.nan
+    if len(m_pos) > 1:
+        jumps = np.abs(np.diff(m_pos))
+        i = int(np.argmax(jumps))
+        if jumps[i] > jump_tol: H_sf = 0.5 * (H_pos[i] + H_pos[i+1])
+
+    M_r = np.interp(0, H[::-1], m[::-1])
+    H_c = np.nan
+    zero = np.nonzero(m <= 0)[0]
+    if len(zero) > 0:
+        i = zero[0]
+        H_c = H[i] if i == 0 else np.interp(0, [m[i], m[i-1]], [H[i], H[i-1]])
+    return H_sat, H_sf, H_c, M_r
+
+
+def simulatePoint(param_values, sim_H, options):
+    # simulates one point of the phase diagram and returns its characteristic values for all field angles
+    # this runs inside the worker processes, so it is a module function
+    model = MacrospinModel(None, sim_H, [list(p) if isinstance(p, list) else p for p in param_values], **options)
+    result = model.calculateMH()
+    M_sat = param_values[0] + param_values[5]
+    row = []
+    for M in result[0]:
+        row += getCharacteristicFields(sim_H, M, M_sat)
+    return row
+
+
+class PhaseDiagram():
+    '''
+    Maps the characteristic fields (saturation, spin-flop and coercive field) and the remanence of the macrospin model over a
+    grid or a Latin hypercube of up to all eight model parameters. The points are simulated in a process pool and every finished
+    point is appended to a tab separated table right away, so an interrupted run continues where it stopped, if run() is called again
+    with the same design and file (a table whose rows don't match the points of the design is rejected).
+    Points whose simulation fails are reported and left out of the table, so the next run() tries them again.
+    param_values: model parameters in SI units (like MacrospinModel), the swept ones are replaced point by point
+    ranges: {index in param_values (0 - 7): (low, high)} in SI units
+    design: "grid" with n points per parameter (n: int or {index: int}) or "latin" with n points in total, drawn with seed
+    sim_H: down sweep from +H_max to -H_max (in T), options: further MacrospinModel keywords (e.g. adaptive_step="on")
+    '''
+    def __init__(self, observer, param_values, ranges, sim_H, design="grid", n=10, seed=0, workers=1, options=None):
+        self.observer = observer if observer is not None else ModelObserver()
+        self.param_values = param_values
+        self.para_ind = sorted(ranges)
+        self.ranges = ranges
+        self.sim_H = list(sim_H)
+        self.design = design
+        self.n = n
+        self.seed = seed
+        self.workers = workers
+        self.options = dict(options) if options is not None else {}
+        self.options["full_hyst"] = "off"
+        self.points = self.getDesign()
+
+
+    def getDesign(self):
+        # (number of points x number of swept parameters) in SI units, always the same for the same design, n and seed
+        if self.design == "grid":
+            axes = []
+            for i in self.para_ind:
+                n = self.n[i] if isinstance(self.n, dict) else self.n
+                axes.append(np.linspace(self.ranges[i][0], self.ranges[i][1], n))
+            return np.array(list(itertools.product(*axes)), dtype=np.float64).reshape(-1, len(self.para_ind))
+        elif self.design == "latin":
+            # one point in each of the n strata of every parameter, the strata are combined randomly
+            rng = np.random.default_rng(self.seed)
+            points = np.empty((self.n, len(self.para_ind)))
+            for k, i in enumerate(self.para_ind):
+                u = (rng.permutation(self.n) + rng.random(self.n)) / self.n
+                points[:, k] = self.ranges[i][0] + u * (self.ranges[i][1] - self.ranges[i][0])
+            return points
+        raise ValueError("unknown design " + str(self.design) + ", use 'grid' or 'latin'")
+
+
+    def getColumns(self):
+        names, units = ["point"], ["[]"]
+        for i in self.para_ind:
+            names.append(DataIO.PARAM_NAMES[DataIO.PARAM_COLUMNS[i]])
+            units.append(DataIO.PARAM_UNITS[DataIO.PARAM_COLUMNS[i]])
+        for phiH in self.param_values[8]:
+            phiH = str(round(phiH*180/np.pi, 0))
+            for name in ("H_sat", "H_sf", "H_c"):
+                names.append(name + "_(phiH=" + phiH + "°)")
+                units.append("[mT]")
+            names.append("M_r_(phiH=" + phiH + "°)")
+            units.append("[M_sat]")
+        return names, units
+
+
+    def getParamValues(self, point):
+        param_values = list(self.param_values)
+        for i, value in zip(self.para_ind, point): param_values[i] = value
+        return param_values
+
+
+    def getFileValues(self, point):
+        # swept parameters in the units of the parameter file
+        return [float(value * 180/np.pi if i in (2, 7) else value * 1e3) for i, value in zip(self.para_ind, point)]
+
+
+    def formatRow(self, k, row):
+        # parameters in the units of the parameter file, fields in mT
+        values = [str(k)] + [repr(value) for value in self.getFileValues(self.points[k])]
+        for j, value in enumerate(row):
+            values.append(repr(float(value if j % 4 == 3 else value * 1e3)))
+        return "\t".join(values) + "\n"
+
+
+    def readDone(self, filename, header):
+        # indices of the points which are already in the table, a partially written last line (e.g. after a kill) is cut off
+        # every stored row has to have the parameter values of its point, otherwise the table belongs to another design (ranges, n, seed)
+        with open(filename, "r", encoding="utf-8") as f:
+            text = f.read()
+        if not text.startswith(header):
+            raise ValueError(filename + " belongs to a different phase diagram, choose another file or delete it")
+        if not text.endswith("\n"):
+            text = text[:text.rfind("\n")+1]
+            with open(filename, "w", encoding="utf-8") as f: f.write(text)
+        done = set()
+        for line in text[len(header):].splitlines():
+            if line == "": continue
+            values = line.split("\t")
+            k = int(values[0])
+            stored = [float(value) for value in values[1:len(self.para_ind)+1]]
+            if k >= len(self.points) or not np.allclose(stored, self.getFileValues(self.points[k]), rtol=1e-12, atol=0):
+                raise ValueError(filename + " belongs to a different phase diagram (point " + str(k) + " has other parameter values), choose another file or delete it")
+            done.add(k)
+        return done
+
+
+    def run(self, filename):
+        # simulates all points which are not yet in the table filename and returns the whole table as a dict of columns
+        # returns None if the stop was requested (the finished points stay in the table)
+        names, units = self.getColumns()
+        header = "\t".join(names) + "\n" + "\t".join(units) + "\n"
+        if os.path.exists(filename):
+            done = self.readDone(filename, header)
+        else:
+            with open(filename, "w", encoding="utf-8") as f: f.write(header)
+            done = set()
+        todo = [k for k in range(len(self.points)) if k not in done]
+        if len(done) > 0: self.observer.writeConsole("Resuming phase diagram: " + str(len(done)) + " of " + str(len(self.points)) + " points are done.")
+
+        stopped = False
+        self.failed = []
+        with open(filename, "a", encoding="utf-8") as f:
+            if self.workers > 1:
+                stopped = self.runPool(todo, f, len(done))
+            else:
+                for n_done, k in enumerate(todo):
+                    if self.observer.stopRequested():
+                        stopped = True
+                        break
+                    try:
+                        row = simulatePoint(self.getParamValues(self.points[k]), self.sim_H, self.options)
+                    except Exception as err:
+                        self.pointFailed(k, err)
+                    else:
+                        f.write(self.formatRow(k, row))
+                        f.flush()
+                    self.observer.setProgress((len(done) + n_done + 1) / len(self.points))
+        if len(self.failed) > 0:
+            self.observer.writeConsole(str(len(self.failed)) + " points failed and are missing in the table, run it again to retry them.")
+        if stopped:
+            self.observer.writeConsole("Phase diagram stopped, run it again to continue.")
+            return None
+        return self.load(filename)
+
+
+    def pointFailed(self, k, err):
+        # a failed point is only reported, the other points go on
+        self.failed.append(k)
+        self.observer.writeConsole("Point " + str(k) + " (" + ", ".join(repr(value) for value in self.getFileValues(self.points[k])) + ") failed: " + str(err))
+
+
+    def runPool(self, todo, f, n_done):
+        # only a few points per worker are submitted at once, so a stop request doesn't have to wait for the whole design
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx) as pool:
+            todo = iter(todo)
+            pending = {}
+            while True:
+                try:
+                    while len(pending) < 4 * self.workers:
+                        k = next(todo, None)
+                        if k is None: break
+                        pending[pool.submit(simulatePoint, self.getParamValues(self.points[k]), self.sim_H, self.options)] = k
+                except BrokenProcessPool:
+                    # a worker process died (e.g. out of memory), the points which are not in the table yet are left for the next run
+                    self.observer.writeConsole("A worker process of the phase diagram died.")
+                    return True
+                if len(pending) == 0: return False
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    k = pending.pop(future)
+                    try:
+                        row = future.result()
+                    except Exception as err:
+                        self.pointFailed(k, err)
+                    else:
+                        f.write(self.formatRow(k, row))
+                    n_done += 1
+                f.flush()
+                self.observer.setProgress(n_done / len(self.points))
+                if self.observer.stopRequested():
+                    pool.shutdown(cancel_futures=True)
+                    return True
+
+
+    def load(self, filename):
+        # the table as {column name: array}, sorted by the point index
+        with open(filename, "r", encoding="utf-8") as f:
+            names = f.readline().replace("\n", "").split("\t")
+            f.readline()
+            lines = [line for line in f if line.strip() != ""]
+        # the table is empty if all points failed
+        data = np.loadtxt(lines, delimiter="\t", ndmin=2).reshape(-1, len(names)) if len(lines) > 0 else np.empty((0, len(names)))
+        data = data[np.argsort(data[:, 0])]
+        return {name: data[:, i] for i, name in enumerate(names)}
@@ -6,8 +6,13 @@ https://github.com/Elliot-Wadge/Modeling-magnetization-reversal-in-multilayers-w
 This model class is still under construction.
 '''
 
+import time
+import copy
 import numpy as np
 import scipy.optimize as o
+import scipy.linalg
+
+from MacrospinModel import mirrorSweep
 
 
 def normalizeRadian(phi):      # reduce angles to (-pi < phi < pi)
@@ -22,7 +27,8 @@ def normalizeRadian(phi):      # reduce angles to (-pi < phi < pi)
         return p
 
 class WadgeDiscreteEnergyModel():
-    def __init__(self, gui, h_sweep, param_values, exp_M=None, fit_paras=None, fit_para_ind=[], fit_type=None, bnds=None, full_hyst="off"):
+    def __init__(self, gui, h_sweep, param_values, exp_M=None, fit_paras=None, fit_para_ind=[], fit_type=None, bnds=None, full_hyst="off", instrument=False, solver="newton",
+                 exp_H=[], use_sim_field="off", multires=False, coarse_factor=4, mirror=False):
         '''
         param_values = [dA, MsA, AexA, J1, J2, dB, MsB, AexB, d]
         dA: m
@@ -47,6 +53,7 @@ class WadgeDiscreteEnergyModel():
         self.J1 *= 1e3  # mJ/m^2
         self.J2 *= 1e3  # mJ/m^2
 
+        self.Aex_A, self.Aex_B = self.AexA, self.AexB     # per FM (1E-11 J/m), to discretize them again with another d (see coarsen)
         self.AexA *= np.ones(self.NA-1)
         self.AexB *= np.ones(self.NB-1)
         self.MsA *= np.ones(self.NA)
@@ -61,8 +68,18 @@ class WadgeDiscreteEnergyModel():
         #self.gui = gui
         #if self.gui is not None: self.gui.prog_bar.set(0)
         self.h_sweep = list(h_sweep)
+        self.exp_H = list(exp_H)
+        self.mirror = mirror    # False: calculateMH returns M(H) of h_sweep as it is, True: the sweep modes of MacrospinModel (see calculateMH)
+        self.full_hyst = full_hyst  # with mirror: "off": h_sweep is only the down sweep, which is mirrored like in MacrospinModel, "on": h_sweep is the whole loop
+        self.use_sim_field = use_sim_field
+        self.saturated_ind = None
         #self.param_values = param_values
         self.exp_M = exp_M
+        self.instrument = instrument    # record every field step in solver_log (same columns as in MacrospinModel, but M is normalized)
+        self.solver_log = None
+        self.solver = solver    # "newton" for the banded newton solver (see minimizeChain) or "bfgs" for scipy's BFGS
+        self.multires = multires    # start the sweep from the solution of a coarser chain (see getInitialThetas)
+        self.coarse_factor = coarse_factor  # each coarser level has coarse_factor times thicker sublayers
         #self.fit_paras = fit_paras
         #self.fit_para_ind = fit_para_ind
         #self.fit_type = fit_type
@@ -70,21 +87,21 @@ class WadgeDiscreteEnergyModel():
         #self.para_scale = [self.para_scale[i] for i in fit_para_ind]
         #self.fitting = False
         #self.bnds = bnds
-        #self.full_hyst = full_hyst
         #if len(self.h_sweep) > 0: self.half_sweep_ind = self.h_sweep.index(min(self.h_sweep))
         #self.best_FOM = 100000
         #self.linkedParas = False
 
         
         # I want a list of the H step density for FOM weighting later on
+        exp_H = self.exp_H if len(self.exp_H) > 0 else self.h_sweep
         self.exp_H_steps = []
-        for i in range(len(self.h_sweep)):
+        for i in range(len(exp_H)):
             if i == 0:
-                dH = 2 * np.abs(self.h_sweep[i] - self.h_sweep[i+1])
-            elif i == len(self.h_sweep)-1:
-                dH = 2 * np.abs(self.h_sweep[i-1] - self.h_sweep[i])
+                dH = 2 * np.abs(exp_H[i] - exp_H[i+1])
+            elif i == len(exp_H)-1:
+                dH = 2 * np.abs(exp_H[i-1] - exp_H[i])
             else:
-                dH = np.abs(self.h_sweep[i-1] - self.h_sweep[i]) + np.abs(self.h_sweep[i] - self.h_sweep[i+1])
+                dH = np.abs(exp_H[i-1] - exp_H[i]) + np.abs(exp_H[i] - exp_H[i+1])
             self.exp_H_steps.append(dH)
 
 
@@ -98,13 +115,20 @@ class WadgeDiscreteEnergyModel():
 
         self.dAexA = 100 * Aex * np.ones(self.NA-1) / self.d    # mJ/m^2
         self.dAexB = 100 * Aex * np.ones(self.NB-1) / self.d    # mJ/m^2
+        self.Aex_A, self.Aex_B = Aex, Aex
 
         m, phiA, phiB, Hs = self.calculateMH()
-        return m
+        return self.M_FOM     # m itself without mirror, with mirror the M(H) of the exp. fields
     
 
-    def diff_evo_fitMH(self, J1, J2, Aex, bnds):
-        global_fitted_paras = o.differential_evolution(self.fit_cost, bounds=bnds, x0=[J1, J2, Aex], maxiter=5, popsize=5, polish=False, disp=True)
+    def diff_evo_fitMH(self, J1, J2, Aex, bnds, coarse_generations=2):
+        if self.multires and coarse_generations > 0 and self.coarsen() is not None:
+            # the first generations run on the coarse chain, its final population is the start of the fine differential evolution
+            coarse_fit = o.differential_evolution(self.coarsen().fit_cost, bounds=bnds, x0=[J1, J2, Aex], maxiter=coarse_generations, popsize=5, polish=False, disp=True)
+            print("coarse global fit done")
+            global_fitted_paras = o.differential_evolution(self.fit_cost, bounds=bnds, init=coarse_fit.population, maxiter=max(5 - coarse_generations, 1), polish=False, disp=True)
+        else:
+            global_fitted_paras = o.differential_evolution(self.fit_cost, bounds=bnds, x0=[J1, J2, Aex], maxiter=5, popsize=5, polish=False, disp=True)
         print("global fit done")
         polished_fit_paras = o.minimize(self.fit_cost, global_fitted_paras.x, method='L-BFGS-B', bounds=bnds, options={"ftol": 1e-4})
         print("local fit done")
@@ -116,10 +140,11 @@ class WadgeDiscreteEnergyModel():
 
         self.dAexA = 100 * Aex * np.ones(self.NA-1) / self.d
         self.dAexB = 100 * Aex * np.ones(self.NB-1) / self.d
+        self.Aex_A, self.Aex_B = Aex, Aex
         
-        m, phiA, phiB, Hs, FOM = self.calculateMH()
+        m, phiA, phiB, Hs = self.calculateMH()
         #if len(M) == 0: raise Exception # if we pressed the stop button, we raise an Exception to stop fitting
-        #FOM = self.getFOM(sim_M=m)
+        FOM = self.getFOM(sim_M=self.M_FOM)
         print("FOM = " + str(FOM))
         return FOM
     
@@ -131,46 +156,72 @@ class WadgeDiscreteEnergyModel():
         return FOM
 
 
-    def calculateMH(self, tol=1e-6):
+    def calculateMH(self, tol=1e-6, sat_tol=0.0005):
         '''
-        This is the function 'energy_M' from E. Wadge
+        This is the function 'energy_M' from E. Wadge. Without mirror, M(H) is returned for the fields of h_sweep. With mirror, it has the sweep
+        modes of MacrospinModel: for full_hyst "off" only the down sweep h_sweep is simulated and then mirrored / interpolated onto the exp. fields
+        by mirrorSweep, for "on" h_sweep is the whole loop.
+        Once the magnetization is saturated along the field (within sat_tol) and the field only gets stronger for the rest of the sweep,
+        the remaining field steps are filled with the saturated state without solving. saturated_ind is the first of them (None if all were solved).
+        returns the M(H) loop (relative to the saturation), the sublayer angles (in deg) of h_sweep and the index of the last solved field step
+        M(H) interpolated onto the exp. fields for the FOM is stored in M_FOM
         '''
-        ret = np.ones(len(self.h_sweep))
-        phiA0, phiB0 = [], []
-        ini_thetas = np.concatenate((np.arange(1,self.NA+1,1), np.arange(1,self.NB+1,1)))
+        n = len(self.h_sweep)
+        ret = np.ones(n)
+        phiA0, phiB0 = np.empty((n, self.NA)), np.empty((n, self.NB))
+        ini_thetas = self.getInitialThetas(self.h_sweep[0], tol)
+        Ms = self.MsA * np.ones(self.NA), self.MsB * np.ones(self.NB)
+        Ms_sum = np.sum(Ms[0]) + np.sum(Ms[1])
+
+        # stronger_tail[i]: all fields after i have the same sign as h_sweep[i] and their magnitude never decreases
+        h = np.asarray(self.h_sweep, dtype=np.float64)
+        stronger_tail = np.zeros(n, dtype=bool)
+        stronger_tail[-1] = True
+        for i in range(n-2, -1, -1):
+            stronger_tail[i] = stronger_tail[i+1] and h[i] * h[i+1] > 0 and abs(h[i+1]) >= abs(h[i])
+
+        steps = []
+        self.saturated_ind = None
         for i, H in enumerate(self.h_sweep):
-            thetas_opt = o.minimize(self.energy_asymmetric, ini_thetas, args=(H,), tol=tol).x
+            if self.instrument: start = time.perf_counter()
+            if self.solver == "bfgs":
+                res = o.minimize(self.energy_asymmetric, ini_thetas, args=(H,), jac=self.energy_asymmetric_grad, tol=tol)
+            else:
+                res = self.minimizeChain(ini_thetas, H, gtol=tol)
+            thetas_opt = res.x
 
             for j, theta in enumerate(thetas_opt):
                 thetas_opt[j] = normalizeRadian(theta)
             ini_thetas = thetas_opt
 
-            if hasattr(self.MsA, "__iter__"):
-                MsA_sum = np.sum(self.MsA)
-            else:
-                MsA_sum = self.NA*self.MsA
-
-            if hasattr(self.MsB, "__iter__"):
-                MsB_sum = np.sum(self.MsB)
-            else:
-                MsB_sum = self.NB*self.MsB
-
-            mag = 1/(MsA_sum + MsB_sum) * (np.sum(self.MsA*np.cos(thetas_opt[:self.NA])) + np.sum(self.MsB*np.cos(thetas_opt[self.NA:])))
-
+            mag = 1/Ms_sum * (np.sum(Ms[0]*np.cos(thetas_opt[:self.NA])) + np.sum(Ms[1]*np.cos(thetas_opt[self.NA:])))
             ret[i] = mag
-            phiA0.append(thetas_opt[:self.NA])
-            phiB0.append(thetas_opt[self.NA:])
+            if self.instrument:
+                steps.append((self.phiH*180/np.pi, H, mag, 1e3*(time.perf_counter() - start), res.nit, res.nfev, res.get("nhev", 0), 0, 0, bool(res.success)))
+            phiA0[i] = thetas_opt[:self.NA]
+            phiB0[i] = thetas_opt[self.NA:]
             Hs_i = i
 
-            if abs(1-mag) < 0.0005:
+            # magnetization along the field
+            mag_H = np.sign(H)/Ms_sum * (np.sum(Ms[0]*np.cos(thetas_opt[:self.NA] - self.phiH)) + np.sum(Ms[1]*np.cos(thetas_opt[self.NA:] - self.phiH)))
+            if abs(1-mag_H) < sat_tol and stronger_tail[i] and i < n-1:
+                # all sublayers stay parallel to the field for the rest of the sweep
+                theta_sat = normalizeRadian(self.phiH + (np.pi if H < 0 else 0))
+                ret[i+1:] = np.cos(theta_sat)
+                phiA0[i+1:], phiB0[i+1:] = theta_sat, theta_sat
+                self.saturated_ind = i+1
                 break
         
-        #ret *= (self.dA * self.MsA[0] + self.dB * self.MsB[0])
-        phiA0 = np.asarray(phiA0)
+        if self.instrument:
+            steps = np.array(steps, dtype=np.float64).reshape(-1, 10)
+            self.solver_log = {name: steps[:, k] for k, name in enumerate(["phiH", "H", "M", "time", "iterations", "evaluations", "hessians", "escapes", "escape_evaluations", "converged"])}
+        self.M_FOM = ret
+        if self.mirror:
+            ret, M_FOM = mirrorSweep(list(ret), self.h_sweep, self.exp_H, full_hyst=self.full_hyst, use_sim_field=self.use_sim_field)
+            ret = np.asarray(ret, dtype=np.float64)
+            self.M_FOM = np.asarray(M_FOM) if self.use_sim_field == "on" and len(self.exp_H) > 0 else ret
         phiA0 *= 180/np.pi
-        phiB0 = np.asarray(phiB0)
         phiB0 *= 180/np.pi
-        #FOM = self.getFOM(ret)
         return ret, phiA0, phiB0, Hs_i
     
 
@@ -183,4 +234,140 @@ class WadgeDiscreteEnergyModel():
         E_ZCo = -H*np.sum(self.dMsA*np.cos(thetas[:self.NA] - self.phiH)) - H*np.sum(self.dMsB*np.cos(thetas[self.NA:] - self.phiH))
         E_UMA = -0.5*self.HaniA*np.sum(self.dMsA*np.cos(thetas[:self.NA] - self.phianiA)**2) - 0.5*self.HaniB*np.sum(self.dMsB*np.cos(thetas[self.NA:] - self.phianiB)**2)
         # print(f"E_RKKY = {E_RKKY}\nE_ex = {E_ex}\nE_Z = {E_ZCo}\ntotal={E_RKKY + E_ex + E_ZCo}")
-        return E_RKKY + E_ex + E_ZCo + E_UMA
\ No newline at end of file
+        return E_RKKY + E_ex + E_ZCo + E_UMA
+
+
+    def energy_asymmetric_grad(self, thetas, H):
+        '''
+        Analytic gradient of energy_asymmetric with respect to all sublayer angles thetas.
+        Every sublayer only couples to its neighbours, so the exchange terms (and the RKKY term between the two FMs)
+        are torques on the N-1 bonds of the chain, which act with opposite signs on both ends of each bond
+        '''
+        a, b = thetas[self.NA-1], thetas[self.NA]
+        sin_bonds = np.sin(thetas[:-1] - thetas[1:])
+        torque = np.empty(len(thetas) - 1)
+        torque[:self.NA-1] = 2 * self.dAexA * sin_bonds[:self.NA-1]
+        torque[self.NA-1] = self.J1 * np.sin(a - b) + self.J2 * np.sin(2 * (a - b))
+        torque[self.NA:] = 2 * self.dAexB * sin_bonds[self.NA:]
+        grad = np.zeros(len(thetas))
+        grad[:-1] += torque
+        grad[1:] -= torque
+
+        # Zeeman and uniaxial anisotropy act on each sublayer on its own
+        grad[:self.NA] += H * self.dMsA * np.sin(thetas[:self.NA] - self.phiH) + 0.5 * self.HaniA * self.dMsA * np.sin(2 * (thetas[:self.NA] - self.phianiA))
+        grad[self.NA:] += H * self.dMsB * np.sin(thetas[self.NA:] - self.phiH) + 0.5 * self.HaniB * self.dMsB * np.sin(2 * (thetas[self.NA:] - self.phianiB))
+        return grad
+
+
+    def energy_asymmetric_hess(self, thetas, H):
+        '''
+        Analytic hessian of energy_asymmetric. It is tridiagonal, since every sublayer only couples to its neighbours,
+        returns its diagonal (N) and its off-diagonal (N-1)
+        '''
+        a, b = thetas[self.NA-1], thetas[self.NA]
+        cos_bonds = np.cos(thetas[:-1] - thetas[1:])
+        curvature = np.empty(len(thetas) - 1)
+        curvature[:self.NA-1] = 2 * self.dAexA * cos_bonds[:self.NA-1]
+        curvature[self.NA-1] = self.J1 * np.cos(a - b) + 2 * self.J2 * np.cos(2 * (a - b))
+        curvature[self.NA:] = 2 * self.dAexB * cos_bonds[self.NA:]
+        diag = np.zeros(len(thetas))
+        diag[:-1] += curvature
+        diag[1:] += curvature
+        diag[:self.NA] += H * self.dMsA * np.cos(thetas[:self.NA] - self.phiH) + self.HaniA * self.dMsA * np.cos(2 * (thetas[:self.NA] - self.phianiA))
+        diag[self.NA:] += H * self.dMsB * np.cos(thetas[self.NA:] - self.phiH) + self.HaniB * self.dMsB * np.cos(2 * (thetas[self.NA:] - self.phianiB))
+        return diag, -curvature
+
+
+    def minimizeChain(self, thetas, H, gtol=1e-6, xtol=1e-12, maxiter=200, max_step=0.5):
+        '''
+        Damped newton minimizer of energy_asymmetric, which solves the tridiagonal hessian with a banded cholesky decomposition,
+        so one iteration costs O(N) instead of the O(N^2) of BFGS. If the hessian is not positive definite, its diagonal is shifted
+        (Levenberg-Marquardt) until it is, so every step goes downhill. Steps are limited to max_step (in rad) per sublayer and halved
+        until the energy decreases. Converged when the largest gradient component drops below gtol (like scipy's BFGS with tol)
+        and the hessian is positive definite, stationary saddle points / maxima are left along their most negative curvature
+        '''
+        x = np.array(thetas, dtype=np.float64)
+        E, grad = self.energy_asymmetric(x, H), self.energy_asymmetric_grad(x, H)
+        nfev, nhev, success = 1, 0, False
+        bands = np.zeros((2, len(x)))
+        for nit in range(1, maxiter+1):
+            diag, off = self.energy_asymmetric_hess(x, H)
+            nhev += 1
+            bands[0, 1:] = off
+            shift = 0
+            scale = np.max(np.abs(diag)) + 1e-12
+            while True:
+                bands[1] = diag + shift
+                try:
+                    step = -scipy.linalg.solveh_banded(bands, grad, check_finite=False)
+                    break
+                except np.linalg.LinAlgError:
+                    # shift by just a bit more than the most negative eigenvalue, so soft directions still get long newton steps
+                    if shift == 0:
+                        lam = scipy.linalg.eigh_tridiagonal(diag, off, eigvals_only=True, select="i", select_range=(0, 0))[0]
+                        shift = max(-lam, 0) * (1 + 1e-3) + 1e-9 * scale
+                    else:
+                        shift = max(2 * shift, 1e-3 * scale)
+            if np.max(np.abs(grad)) <= gtol:
+                if shift == 0:
+                    success = True
+                    break
+                # we are on a saddle point / maximum (e.g. the saturated state after the field reversed),
+                # so we leave it along the eigenvector of the hessian with the most negative curvature
+                lam, v = scipy.linalg.eigh_tridiagonal(diag, off, select="i", select_range=(0, 0))
+                step = v[:, 0] if np.dot(grad, v[:, 0]) <= 0 else -v[:, 0]
+                step *= max_step / np.max(np.abs(step))
+            step *= min(1, max_step / (np.max(np.abs(step)) + 1e-300))
+
+            # backtracking line search
+            slope = np.dot(grad, step)
+            t = 1
+            while True:
+                E_new = self.energy_asymmetric(x + t * step, H)
+                nfev += 1
+                if E_new <= E + 1e-4 * t * slope + 1e-14 * abs(E): break
+                t *= 0.5
+                if t < 1e-10: break
+            if t < 1e-10: break     # no downhill step possible anymore
+            x += t * step
+            E, grad = E_new, self.energy_asymmetric_grad(x, H)
+            if np.max(np.abs(t * step)) <= xtol:
+                success = np.max(np.abs(grad)) <= 1e3 * gtol
+                break
+        return o.OptimizeResult(x=x, fun=E, jac=grad, nit=nit, nfev=nfev, nhev=nhev, success=success)
+
+
+    def coarsen(self, factor=None):
+        # copy of the model with coarse_factor times thicker sublayers and the same (current) material parameters
+        # returns None if the chain can't get any coarser
+        d = self.d * (self.coarse_factor if factor is None else factor)
+        NA, NB = max(int(self.dA*10/d), 1), max(int(self.dB*10/d), 1)
+        if NA + NB >= self.NA + self.NB: return None
+        coarse = copy.copy(self)
+        coarse.d, coarse.NA, coarse.NB = d, NA, NB
+        coarse.MsA, coarse.MsB = self.MsA[0] * np.ones(NA), self.MsB[0] * np.ones(NB)
+        coarse.dMsA, coarse.dMsB = coarse.MsA*d*0.1, coarse.MsB*d*0.1
+        coarse.AexA, coarse.AexB = self.Aex_A * np.ones(NA-1), self.Aex_B * np.ones(NB-1)
+        coarse.dAexA, coarse.dAexB = 100*coarse.AexA/d, 100*coarse.AexB/d
+        coarse.instrument = False
+        return coarse
+
+
+    def getInitialThetas(self, H, tol=1e-6):
+        '''
+        Starting angles of the first field step. Without multires these are E. Wadge's arange(1, N+1) for each FM.
+        With multires, the chain is solved with coarse_factor times thicker sublayers first (recursively, down to one sublayer per FM)
+        and the coarse angle profile is linearly interpolated onto the fine sublayers, so the fine chain starts close to its minimum
+        '''
+        coarse = self.coarsen() if self.multires else None
+        if coarse is None:
+            return np.concatenate((np.arange(1,self.NA+1,1), np.arange(1,self.NB+1,1)))
+        coarse_thetas = coarse.minimizeChain(coarse.getInitialThetas(H, tol), H, gtol=tol).x
+
+        # angles vs. depth at the centers of the sublayers of each FM, unwrapped so the interpolation doesn't jump by 2 pi
+        thetas = []
+        for N, N_c, theta_c in ((self.NA, coarse.NA, coarse_thetas[:coarse.NA]), (self.NB, coarse.NB, coarse_thetas[coarse.NA:])):
+            z_c = (np.arange(N_c) + 0.5) / N_c
+            z = (np.arange(N) + 0.5) / N
+            thetas.append(np.interp(z, z_c, np.unwrap(theta_c)))
+        return np.concatenate(thetas)